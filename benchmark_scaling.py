@@ -0,0 +1,169 @@
+"""
+Scaling check of the parse and export path on synthetic general schedule weeks.
+
+Runs every stage at growing numbers of weeks, records wall time and tracemalloc peak,
+fits the growth exponent on a log-log scale and fails if a stage grows faster than linearly
+or needs more memory per row than the budget.
+
+    python benchmark_scaling.py
+    python benchmark_scaling.py --sizes 1 10 100 --rows-per-day 5
+"""
+import argparse
+import logging
+import math
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+from typing import List, Dict, Callable, Tuple
+
+from config import ScheduleConfig
+from schedule_parser import ScheduleParser, summarize_schedule
+
+DAYS = ['poniedziałek', 'wtorek', 'środa', 'czwartek', 'piątek', 'sobota', 'niedziela']
+MONTHS = ['stycznia', 'lutego', 'marca', 'kwietnia', 'maja', 'czerwca', 'lipca', 'sierpnia', 'września',
+          'października', 'listopada', 'grudnia']
+EDITORS = ['Jan Kowalski', 'Anna Nowak', 'Piotr Zieliński', 'Maria Wiśniewska', 'Tomasz Wójcik']
+HEADERS = ['Lp', 'Program', 'Typ', 'Sala', 'Godziny', 'Uwagi', 'Status', 'Materiał', 'Emisja', 'Wersja', 'Montażysta']
+
+
+def generate_week_html(monday: date, rows_per_day: int) -> str:
+    """Synthetic general schedule page with the same markup the parser reads"""
+    parts = ['<html><body><table><thead><tr>', ''.join(f'<th>{h}</th>' for h in HEADERS), '</tr></thead><tbody>']
+    for day_offset in range(7):
+        day = monday + timedelta(days=day_offset)
+        parts.append(f'<tr><th class="gpt-table-section-header">'
+                     f'{DAYS[day.weekday()]}, {day.day} {MONTHS[day.month - 1]} {day.year}</th></tr>')
+        for row_idx in range(rows_per_day):
+            if row_idx % 5 == 4:
+                # Every fifth row crosses midnight, 22:00 - 01:30
+                start_hour, end_hour = 22, 1
+            else:
+                start_hour = (row_idx * 3) % 21
+                end_hour = start_hour + 2
+            parts.append(
+                f'<tr><td>{row_idx + 1}</td><td><span>Program {day_offset}-{row_idx}</span></td><td>M</td><td>S{row_idx % 4}</td>'
+                f'<td><table><tr class="text-bold"><td>{start_hour:02d}:00\xa0-\xa0{end_hour:02d}:30</td></tr></table></td>'
+                f'<td></td><td></td><td></td><td></td><td></td>'
+                f'<td>{EDITORS[row_idx % len(EDITORS)]}</td></tr>')
+    parts.append('</tbody></table></body></html>')
+    return ''.join(parts)
+
+
+def measure(fn: Callable) -> Tuple[object, float, int]:
+    """Run fn and return its result, wall time in seconds and tracemalloc peak in bytes"""
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    started = time.perf_counter()
+    try:
+        result = fn()
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def fit_exponent(xs: List[float], ys: List[float]) -> float:
+    """Least squares slope of log(y) over log(x), 1.0 means linear growth"""
+    points = [(math.log(x), math.log(y)) for x, y in zip(xs, ys) if x > 0 and y > 0]
+    if len(points) < 2:
+        return 0.0
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    variance = sum((x - mean_x) ** 2 for x, _ in points)
+    if variance == 0:
+        return 0.0
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / variance
+
+
+def run_size(weeks: int, rows_per_day: int, output_dir: str) -> Dict[str, Tuple[float, int, int]]:
+    """Run all stages for a number of weeks, returns stage -> (seconds, peak bytes, rows)"""
+    config = ScheduleConfig(username='', password='', output_dir=output_dir, output_filename=f'scaling_{weeks}.xlsx',
+                            start_date='', end_date='', is_personal=False)
+    first_monday = date(2024, 1, 1)
+    pages = [generate_week_html(first_monday + timedelta(weeks=i), rows_per_day) for i in range(weeks)]
+
+    def parse_weeks() -> List[List[Dict]]:
+        weekly = []
+        for html_content in pages:
+            parser = ScheduleParser(html_content, config)
+            parser.parse_schedule()
+            weekly.append(parser.get_parsed_data())
+        return weekly
+
+    weekly_rows, parse_time, parse_peak = measure(parse_weeks)
+    pages.clear()
+
+    def combine() -> ScheduleParser:
+        # Same as scrape_schedule: extend the combined list week by week and hand it to a fresh parser
+        all_data = []
+        for rows in weekly_rows:
+            all_data.extend(rows)
+        combined_parser = ScheduleParser("", config)
+        combined_parser.set_parsed_data(all_data)
+        return combined_parser
+
+    combined_parser, combine_time, combine_peak = measure(combine)
+    row_count = len(combined_parser.get_parsed_data())
+
+    _, summary_time, summary_peak = measure(lambda: summarize_schedule(combined_parser.get_parsed_data(), False))
+    _, export_time, export_peak = measure(combined_parser.save_to_xlsx)
+
+    return {
+        'parse': (parse_time, parse_peak, row_count),
+        'combine': (combine_time, combine_peak, row_count),
+        'summary': (summary_time, summary_peak, row_count),
+        'export': (export_time, export_peak, row_count),
+    }
+
+
+def main() -> int:
+    arg_parser = argparse.ArgumentParser(description="Check that parsing and export scale linearly with the range size")
+    arg_parser.add_argument('--sizes', type=int, nargs='+', default=[1, 10, 100, 500], help="Numbers of weeks to run")
+    arg_parser.add_argument('--rows-per-day', type=int, default=10)
+    arg_parser.add_argument('--max-exponent', type=float, default=1.2,
+                            help="Highest accepted growth exponent of time and memory, 1.0 is linear")
+    arg_parser.add_argument('--row-memory-budget', type=float, default=16.0,
+                            help="Highest accepted tracemalloc peak per row in KiB at the largest size")
+    args = arg_parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+
+    results: Dict[str, List[Tuple[int, float, int]]] = {}
+    with tempfile.TemporaryDirectory() as output_dir:
+        for weeks in sorted(args.sizes):
+            for stage, (seconds, peak, rows) in run_size(weeks, args.rows_per_day, output_dir).items():
+                results.setdefault(stage, []).append((rows, seconds, peak))
+                print(f"{weeks:>5} weeks {rows:>8} rows  {stage:<8} {seconds:9.3f} s {peak / 1024:12.1f} KiB")
+
+    failures = []
+    print()
+    for stage, measurements in results.items():
+        # The smallest size is dominated by constant overhead, fit the growth on the larger ones
+        fitted = measurements[1:] if len(measurements) > 2 else measurements
+        rows = [row_count for row_count, _, _ in fitted]
+        time_exponent = fit_exponent(rows, [seconds for _, seconds, _ in fitted])
+        memory_exponent = fit_exponent(rows, [peak for _, _, peak in fitted])
+        largest_rows, _, largest_peak = measurements[-1]
+        per_row = largest_peak / 1024 / max(largest_rows, 1)
+        print(f"{stage:<8} time exponent {time_exponent:5.2f}  memory exponent {memory_exponent:5.2f}  "
+              f"{per_row:8.2f} KiB/row")
+
+        if time_exponent > args.max_exponent:
+            failures.append(f"{stage}: time grows with exponent {time_exponent:.2f}")
+        if memory_exponent > args.max_exponent:
+            failures.append(f"{stage}: memory grows with exponent {memory_exponent:.2f}")
+        if per_row > args.row_memory_budget:
+            failures.append(f"{stage}: {per_row:.2f} KiB per row exceeds budget of {args.row_memory_budget} KiB")
+
+    if failures:
+        print("\nFAILED:\n" + "\n".join(failures))
+        return 1
+    print("\nOK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,76 @@
-from dataclasses import dataclass
+import re
+from dataclasses import dataclass, field
+from datetime import datetime
 from pathlib import Path
+from typing import Optional, Set, Pattern, Dict, List
+
+
+@dataclass
+class ScheduleFilter:
+    """Row filters applied by the parser while it walks the schedule table"""
+    editors: Optional[Set[str]] = None
+    description: Optional[str] = None
+    description_regex: Optional[str] = None
+    start_date: Optional[str] = None
+    end_date: Optional[str] = None
+    min_duration: Optional[float] = None
+
+    _compiled_regex: Optional[Pattern] = field(default=None, init=False, repr=False)
+
+    def __post_init__(self):
+        if self.editors is not None:
+            self.editors = {editor.strip() for editor in self.editors}
+        if self.description is not None:
+            self.description = self.description.lower()
+        if self.description_regex:
+            self._compiled_regex = re.compile(self.description_regex, re.IGNORECASE)
+
+    @staticmethod
+    def parse_date(date: str) -> datetime:
+        """Parse date string in format DD.MM.YYYY to datetime object"""
+        return datetime.strptime(date, '%d.%m.%Y')
+
+    def accepts_date(self, date: str) -> bool:
+        if self.start_date is None and self.end_date is None:
+            return True
+        parsed = self.parse_date(date)
+        if self.start_date and parsed < self.parse_date(self.start_date):
+            return False
+        if self.end_date and parsed > self.parse_date(self.end_date):
+            return False
+        return True
+
+    def accepts_editor(self, editor: str) -> bool:
+        return self.editors is None or editor in self.editors
+
+    def accepts_description(self, description: str) -> bool:
+        if self.description is not None and self.description not in description.lower():
+            return False
+        if self._compiled_regex is not None and not self._compiled_regex.search(description):
+            return False
+        return True
+
+    def accepts_duration(self, duration: float) -> bool:
+        return self.min_duration is None or duration >= self.min_duration
+
+    def accepts_row(self, entry: Dict) -> bool:
+        """
+        Check an already parsed row against all filters. Personal schedule rows have no editor,
+        the editor filter doesn't apply to them, like in the parser.
+        """
+        return (self.accepts_date(entry['date'])
+                and ('editor' not in entry or self.accepts_editor(entry['editor']))
+                and self.accepts_description(entry['description'])
+                and self.accepts_duration(entry['duration']))
+
+
+@dataclass
+class SchedulePeriod:
+    """A named date range (DD.MM.YYYY) requested as a separate part of the export"""
+    name: str
+    start_date: str
+    end_date: str
+
 
 @dataclass
 class ScheduleConfig:
@@ -16,6 +87,29 @@ class ScheduleConfig:
     end_date: str
     is_personal: bool
 
+    # Optional row filters (editor, description, date sub-range, minimum duration)
+    filters: Optional[ScheduleFilter] = None
+
+    # Add sheets with total hours per editor per day/week to the export
+    include_summary: bool = True
+
+    # Merge into an existing output file, replacing only the exported weeks
+    append_to_existing: bool = False
+
+    # URL of a shared schedule service (schedule_service.py) used instead of fetching directly
+    service_url: Optional[str] = None
+    # Shared token sent to the schedule service
+    service_token: Optional[str] = None
+
+    # Split the export into one file per 'month' or per 'editor', None for a single file
+    shard_by: Optional[str] = None
+
+    # Several disjoint ranges fetched in one run, replaces start_date/end_date when set
+    periods: Optional[List[SchedulePeriod]] = None
+
+    # Write a sampling profile of the export next to the output file
+    profile: bool = False
+
     def get_full_output_path(self) -> Path:
         return Path(self.output_dir) / self.output_filename
 
@@ -27,4 +121,6 @@ class ScraperConfig:
     personal_schedule_url: str = 'https://gpt.canalplus.pl/User/Schedule'
     parser: str = 'html.parser'
     encoding: str = 'utf-8'
-    request_timeout: int = 30
\ No newline at end of file
+    request_timeout: int = 30
+    # Rough time to fetch and parse one week, used for fetch plan estimates
+    estimated_week_seconds: float = 2.0
@@ -0,0 +1,126 @@
+import json
+import logging
+import os
+import shutil
+import time
+from dataclasses import asdict
+from pathlib import Path
+from typing import List, Dict, Optional
+
+from config import ScheduleConfig
+
+
+class ScheduleCheckpoint:
+    """
+    Journal of already fetched and parsed weeks, so interrupted scrapes can be resumed.
+    The schedule keeps changing, so journals older than max_age seconds are discarded.
+    """
+
+    JOURNAL_FILENAME = 'checkpoint.json'
+    DEFAULT_MAX_AGE = 12 * 60 * 60
+
+    def __init__(self, directory: str, schedule_config: ScheduleConfig, max_age: int = DEFAULT_MAX_AGE):
+        self.directory = Path(directory)
+        self.schedule_config = schedule_config
+        self.key = self.__build_key(schedule_config)
+        self.max_age = max_age
+        self.weeks: Dict[str, str] = {}
+        # Time the first week of the journal was fetched, in seconds since the epoch
+        self.created_at: Optional[float] = None
+
+    @staticmethod
+    def __build_key(schedule_config: ScheduleConfig) -> str:
+        """Build a key identifying the run, a journal is only reused for the same settings"""
+        filters = None
+        if schedule_config.filters:
+            filters = {name: value for name, value in asdict(schedule_config.filters).items()
+                       if not name.startswith('_')}
+            if filters['editors'] is not None:
+                filters['editors'] = sorted(filters['editors'])
+
+        return json.dumps({
+            'username': schedule_config.username,
+            'is_personal': schedule_config.is_personal,
+            'start_date': schedule_config.start_date,
+            'end_date': schedule_config.end_date,
+            'filters': filters,
+            'periods': [asdict(period) for period in schedule_config.periods or []],
+        }, sort_keys=True, ensure_ascii=False)
+
+    @property
+    def journal_path(self) -> Path:
+        return self.directory / self.JOURNAL_FILENAME
+
+    @staticmethod
+    def __write_json(path: Path, content) -> None:
+        """Write JSON atomically so a crash never leaves a half-written file behind"""
+        tmp_path = path.with_suffix(path.suffix + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(content, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def load(self) -> None:
+        """Load the journal of a previous run with the same settings, if there is one"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.weeks = {}
+        self.created_at = None
+
+        if not self.journal_path.exists():
+            return
+
+        try:
+            with open(self.journal_path, encoding='utf-8') as f:
+                journal = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable checkpoint journal: {e}")
+            return
+
+        if journal.get('key') != self.key:
+            logging.info("Checkpoint journal belongs to different settings, starting over")
+            return
+
+        created_at = journal.get('created_at')
+        age = time.time() - created_at if created_at is not None else None
+        if age is None or age > self.max_age:
+            logging.info("Checkpoint journal is too old or undated, starting over")
+            self.__remove_week_files()
+            return
+
+        self.created_at = created_at
+        self.weeks = {week: filename for week, filename in journal.get('weeks', {}).items()
+                      if (self.directory / filename).exists()}
+        if self.weeks:
+            logging.info(f"Resuming from checkpoint, {len(self.weeks)} week(s) already fetched "
+                         f"{age / 60:.0f} minute(s) ago")
+
+    def is_done(self, week: str) -> bool:
+        return week in self.weeks
+
+    def mark_done(self, week: str, rows: List[Dict]) -> None:
+        """Persist parsed rows of a week and record it in the journal"""
+        filename = f"week_{week}.json"
+        self.__write_json(self.directory / filename, rows)
+        self.weeks[week] = filename
+        if self.created_at is None:
+            self.created_at = time.time()
+        self.__write_json(self.journal_path, {'key': self.key, 'created_at': self.created_at, 'weeks': self.weeks})
+
+    def get_rows(self, week: str) -> Optional[List[Dict]]:
+        """Return persisted rows of a week or None if the week was not fetched yet"""
+        filename = self.weeks.get(week)
+        if filename is None:
+            return None
+        with open(self.directory / filename, encoding='utf-8') as f:
+            return json.load(f)
+
+    def __remove_week_files(self) -> None:
+        """Remove rows persisted by a discarded journal, they must never be resumed"""
+        for path in self.directory.glob('week_*.json'):
+            path.unlink(missing_ok=True)
+        self.journal_path.unlink(missing_ok=True)
+
+    def clear(self) -> None:
+        """Remove the journal together with persisted rows"""
+        self.weeks = {}
+        self.created_at = None
+        shutil.rmtree(self.directory)
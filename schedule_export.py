@@ -0,0 +1,113 @@
+import json
+import logging
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import replace
+from pathlib import Path
+from typing import List, Dict, Tuple
+
+from config import ScheduleConfig
+from schedule_parser import ScheduleParser
+from schedule_planner import check_periods_export, fan_out
+
+SHARD_BY_MONTH = 'month'
+SHARD_BY_EDITOR = 'editor'
+
+
+def get_shard_key(entry: Dict, shard_by: str) -> str:
+    """Return the shard a parsed row belongs to, 'YYYY-MM' for months or the editor name"""
+    if shard_by == SHARD_BY_MONTH:
+        _, month, year = entry['date'].split('.')
+        return f"{year}-{month}"
+    if shard_by == SHARD_BY_EDITOR:
+        return entry.get('editor') or 'brak'
+    raise ValueError(f"Unknown shard key: {shard_by}")
+
+
+def partition_rows(schedule_data: List[Dict], shard_by: str) -> Dict[str, List[Dict]]:
+    """Split parsed rows into shards, keeping the original row order within each shard"""
+    shards: Dict[str, List[Dict]] = {}
+    for entry in schedule_data:
+        shards.setdefault(get_shard_key(entry, shard_by), []).append(entry)
+    return dict(sorted(shards.items()))
+
+
+def get_shard_filename(output_filename: str, shard_key: str) -> str:
+    """Build file name of a shard from the output file name, e.g. 'grafik_2025-01.xlsx'"""
+    stem = Path(output_filename).stem
+    safe_key = re.sub(r'[\\/:*?"<>|\s]+', '_', shard_key).strip('_')
+    return f"{stem}_{safe_key}.xlsx"
+
+
+def _write_shard(schedule_config: ScheduleConfig, shard_key: str, rows: List[Dict]) -> Tuple[str, str, int, float]:
+    """Write a single shard with the regular export, runs in a worker process"""
+    shard_config = replace(schedule_config,
+                           output_filename=get_shard_filename(schedule_config.output_filename, shard_key))
+    parser = ScheduleParser("", shard_config)
+    parser.set_parsed_data(rows)
+    parser.save_to_xlsx()
+    hours = round(sum(float(entry['duration']) for entry in rows), 2)
+    return shard_key, shard_config.output_filename, len(rows), hours
+
+
+def write_shards(schedule_config: ScheduleConfig, shards: Dict[str, List[Dict]], manifest_info: Dict) -> Path:
+    """
+    Write each shard to its own file with the regular export, in parallel worker processes.
+    Writes a JSON manifest of the shards next to them and returns its path.
+    """
+    Path(schedule_config.output_dir).mkdir(parents=True, exist_ok=True)
+
+    if len(shards) <= 1:
+        # Not worth starting worker processes for a single file
+        results = [_write_shard(schedule_config, key, rows) for key, rows in shards.items()]
+    else:
+        max_workers = min(len(shards), os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(_write_shard, schedule_config, key, rows) for key, rows in shards.items()]
+            # result() re-raises the export errors of the workers with their original messages
+            results = [future.result() for future in futures]
+
+    manifest = dict(manifest_info)
+    manifest['shards'] = [{'key': key, 'file': filename, 'rows': row_count, 'hours': hours}
+                          for key, filename, row_count, hours in results]
+    manifest_path = Path(schedule_config.output_dir) / f"{Path(schedule_config.output_filename).stem}_manifest.json"
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    logging.info(f"Schedule exported as {len(results)} file(s), manifest saved to {manifest_path}")
+    return manifest_path
+
+
+def save_sharded(schedule_config: ScheduleConfig, schedule_data: List[Dict]) -> Path:
+    """Export rows as one file per shard (month or editor), returns path of the manifest"""
+    shard_by = schedule_config.shard_by
+    if shard_by == SHARD_BY_EDITOR and schedule_config.is_personal:
+        raise ValueError({"title": "Niepoprawne ustawienia eksportu",
+                          "message": "Grafik użytkownika nie zawiera montażystów, wybierz podział na miesiące."})
+
+    return write_shards(schedule_config, partition_rows(schedule_data, shard_by), {
+        'shard_by': shard_by,
+        'start_date': schedule_config.start_date,
+        'end_date': schedule_config.end_date,
+    })
+
+
+def export_rows(schedule_config: ScheduleConfig, schedule_data: List[Dict]) -> None:
+    """Export rows the way the settings ask for: one file per period, per shard or a single file"""
+    periods = schedule_config.periods
+    check_periods_export(periods, schedule_config.shard_by)
+
+    if periods:
+        # One file per requested period, weeks shared by several periods were fetched only once
+        write_shards(schedule_config, fan_out(periods, schedule_data), {
+            'periods': [{'name': period.name, 'start_date': period.start_date, 'end_date': period.end_date}
+                        for period in periods],
+        })
+    elif schedule_config.shard_by:
+        # One file per month/editor, written in parallel
+        save_sharded(schedule_config, schedule_data)
+    else:
+        parser = ScheduleParser("", schedule_config)
+        parser.set_parsed_data(schedule_data)
+        parser.save_to_xlsx()
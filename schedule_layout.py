@@ -0,0 +1,136 @@
+import logging
+import re
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+TIME_PATTERN = re.compile(r'\d{1,2}:\d{2}')
+NUMBER_PATTERN = re.compile(r'[\d\s.,:-]+')
+
+# Number of data rows checked when compiling a plan
+PLAN_SAMPLE_ROWS = 20
+
+# Header labels recognised when compiling a plan from the table header
+TIME_HEADER_PREFIXES = ('godz', 'czas', 'od - do', 'od-do')
+EDITOR_HEADER_PREFIXES = ('montaż',)
+
+
+class ScheduleLayoutError(Exception):
+    """Raised when the general schedule table has a layout no extraction plan can handle"""
+    pass
+
+
+@dataclass(frozen=True)
+class ExtractionPlan:
+    """Positions of the cells to read from each general schedule row"""
+    time_column: int
+    editor_column: int
+    # Legacy positions count nested cells too (row.find_all('td')), header based ones only direct cells
+    recursive: bool
+
+    def get_cells(self, row) -> List:
+        return row.find_all('td', recursive=self.recursive)
+
+
+# Layout used before plans were introduced, positions within all (nested included) cells of a row
+LEGACY_PLAN = ExtractionPlan(time_column=4, editor_column=11, recursive=True)
+
+_plan_cache: Dict[Tuple, ExtractionPlan] = {}
+_plan_cache_lock = threading.Lock()
+
+
+def get_header_labels(soup) -> Tuple[str, ...]:
+    """Return texts of the table header cells, date section headers excluded"""
+    return tuple(th.text.strip() for th in soup.find_all('th')
+                 if 'gpt-table-section-header' not in (th.get('class') or []))
+
+
+def get_layout_fingerprint(soup, first_data_row) -> Tuple:
+    """Identify the layout by its header labels and the number of direct cells in a data row"""
+    return get_header_labels(soup), len(first_data_row.find_all('td', recursive=False))
+
+
+def _find_header_column(labels: Tuple[str, ...], prefixes: Tuple[str, ...]) -> Optional[int]:
+    for idx, label in enumerate(labels):
+        if label.lower().startswith(prefixes):
+            return idx
+    return None
+
+
+def _is_valid_for_row(plan: ExtractionPlan, row) -> bool:
+    """Check that the plan finds a time range and an editor cell in a data row"""
+    cells = plan.get_cells(row)
+    if len(cells) <= max(plan.time_column, plan.editor_column):
+        return False
+    time_cell = cells[plan.time_column].find('tr', class_='text-bold')
+    return bool(time_cell) and len(TIME_PATTERN.findall(time_cell.text)) >= 2
+
+
+def _has_valid_editors(plan: ExtractionPlan, rows: List) -> bool:
+    """
+    Check that the editor cells of the sampled rows hold names. Empty cells are unassigned slots
+    and prove nothing, but a time or a number means the plan reads a different column.
+    """
+    for row in rows:
+        cells = plan.get_cells(row)
+        if len(cells) <= plan.editor_column:
+            return False
+        editor = cells[plan.editor_column].get_text(strip=True)
+        if editor and (TIME_PATTERN.search(editor) or NUMBER_PATTERN.fullmatch(editor)):
+            return False
+    return True
+
+
+def _get_header_plan(labels: Tuple[str, ...]) -> Optional[ExtractionPlan]:
+    """Plan from the columns named in the table header, None if the header doesn't name them"""
+    time_column = _find_header_column(labels, TIME_HEADER_PREFIXES)
+    editor_column = _find_header_column(labels, EDITOR_HEADER_PREFIXES)
+    if time_column is None or editor_column is None:
+        return None
+    return ExtractionPlan(time_column=time_column, editor_column=editor_column, recursive=False)
+
+
+def compile_plan(soup, data_rows: List) -> ExtractionPlan:
+    """
+    Build an extraction plan for a layout from the first data rows of a page, preferring columns
+    named in the table header over the legacy fixed positions. Raises ScheduleLayoutError if neither fits.
+    """
+    first_data_row = data_rows[0]
+    sample = data_rows[:PLAN_SAMPLE_ROWS]
+    labels, _ = get_layout_fingerprint(soup, first_data_row)
+
+    plan = _get_header_plan(labels)
+    if plan is not None:
+        # Header cells may not line up with the row cells (colspan, extra header cells), which would
+        # put every row under a wrong editor, so the editor cells are checked too
+        if _is_valid_for_row(plan, first_data_row) and _has_valid_editors(plan, sample):
+            return plan
+        logging.warning(f"Header based plan {plan} doesn't fit the data, falling back to the legacy layout")
+
+    if _is_valid_for_row(LEGACY_PLAN, first_data_row) and _has_valid_editors(LEGACY_PLAN, sample):
+        return LEGACY_PLAN
+
+    raise ScheduleLayoutError({"title": "Nieznany układ grafiku",
+                               "message": "Układ tabeli grafiku montaży zmienił się i nie da się go odczytać. "
+                                          "Zgłoś to autorowi aplikacji."})
+
+
+def get_extraction_plan(soup, data_rows: List) -> ExtractionPlan:
+    """Return the cached plan for the page layout, compiling it on the first page with that layout"""
+    fingerprint = get_layout_fingerprint(soup, data_rows[0])
+
+    with _plan_cache_lock:
+        plan = _plan_cache.get(fingerprint)
+    if plan is not None:
+        return plan
+
+    plan = compile_plan(soup, data_rows)
+    logging.info(f"Compiled extraction plan {plan} for schedule layout {fingerprint}")
+
+    # A legacy fallback from a rejected header plan may be down to this page's rows, the next page checks again
+    if plan is LEGACY_PLAN and _get_header_plan(fingerprint[0]) is not None:
+        return plan
+
+    with _plan_cache_lock:
+        _plan_cache[fingerprint] = plan
+    return plan
@@ -5,8 +5,19 @@ from typing import List, Dict, Optional
 
 import pandas as pd
 from bs4 import BeautifulSoup
+from openpyxl import load_workbook
+from openpyxl.utils import get_column_letter
 
 from config import ScheduleConfig
+from schedule_layout import ScheduleLayoutError, get_extraction_plan
+
+SUMMARY_DAY_SHEET = 'Godziny dziennie'
+SUMMARY_WEEK_SHEET = 'Godziny tygodniowo'
+
+
+class WorkbookLayoutError(Exception):
+    """Raised when an existing workbook does not match the exported schedule columns"""
+    pass
 
 
 class ScheduleParser:
@@ -65,33 +76,61 @@ class ScheduleParser:
             return self.__convert_date(date_header.text.strip())
         return None
 
+    @staticmethod
+    def __is_program_row(row) -> bool:
+        return bool(row.find('td')) and bool(row.find('span'))
+
     def parse_general_schedule(self) -> List[Dict]:
         """Parse schedule data from HTML content with sequential row processing"""
         current_date = None
+        row_filter = self.schedule_config.filters
         all_rows = self.soup.find_all('tr')
+        # Cell positions are resolved once per page layout, from the first row that holds a time range
+        plan = None
+        has_program_rows = False
 
         for row in all_rows:
             # Check if this is a date row
             if self.__is_date_row(row):
                 current_date = self.__get_date_from_row(row)
+                # Rows of a filtered out day are skipped until the next date header
+                if current_date and row_filter and not row_filter.accepts_date(current_date):
+                    current_date = None
                 continue
 
             # Skip rows without date context
             if not current_date:
                 continue
 
-            cells = row.find_all('td')
-            if not cells:
-                continue
+            if plan is None:
+                if not self.__is_program_row(row):
+                    continue
+                has_program_rows = True
+                if not row.find('tr', class_='text-bold'):
+                    continue
+                # The plan is checked against this row and the following timed program rows
+                data_rows = [candidate for candidate in all_rows[all_rows.index(row):]
+                             if self.__is_program_row(candidate) and candidate.find('tr', class_='text-bold')]
+                plan = get_extraction_plan(self.soup, data_rows)
 
-            program_cell = row.find('span')
-            if not program_cell:
+            cells = plan.get_cells(row)
+            if not cells:
                 continue
 
             try:
+                editor = cells[plan.editor_column].text.strip()
+                if row_filter and not row_filter.accepts_editor(editor):
+                    continue
+
+                program_cell = row.find('span')
+                if not program_cell:
+                    continue
+
                 program_description = program_cell.text.strip()
+                if row_filter and not row_filter.accepts_description(program_description):
+                    continue
 
-                time_cell = cells[4].find('tr', class_='text-bold')
+                time_cell = cells[plan.time_column].find('tr', class_='text-bold')
                 if not time_cell:
                     continue
 
@@ -99,7 +138,8 @@ class ScheduleParser:
                 start_time = times[0].replace('\n', '')
                 end_time = times[2].replace('\n', '')
                 duration = self.__calculate_duration(start_time, end_time)
-                editor = cells[11].text.strip()
+                if row_filter and not row_filter.accepts_duration(duration):
+                    continue
 
                 # program_title and activity columns are always empty because that's what the "client" wanted
                 self.schedule_data.append({
@@ -118,17 +158,27 @@ class ScheduleParser:
             except IndexError:
                 continue
 
+        # Program rows without any time range mean the page markup changed, don't return an empty week silently
+        if plan is None and has_program_rows:
+            raise ScheduleLayoutError({"title": "Nieznany układ grafiku",
+                                       "message": "Nie znaleziono godzin w grafiku montaży. "
+                                                  "Zgłoś to autorowi aplikacji."})
+
         return self.schedule_data
 
     def parse_personal_schedule(self) -> List[Dict]:
         """Parse personal schedule data with sequential row processing"""
         current_date = None
+        row_filter = self.schedule_config.filters
         all_rows = self.soup.find_all('tr')
 
         for row in all_rows:
             # Check if this is a date row
             if self.__is_date_row(row):
                 current_date = self.__get_date_from_row(row)
+                # Rows of a filtered out day are skipped until the next date header
+                if current_date and row_filter and not row_filter.accepts_date(current_date):
+                    current_date = None
                 continue
 
             # Skip rows without date context
@@ -149,6 +199,8 @@ class ScheduleParser:
                     continue
 
                 program_description = program_cell.text.strip()
+                if row_filter and not row_filter.accepts_description(program_description):
+                    continue
 
                 time_cell = row.find('span', class_='text-bold')
                 if not time_cell:
@@ -162,6 +214,8 @@ class ScheduleParser:
                 start_time = times[0].strip().replace('\xa0', '')
                 end_time = times[1].strip().replace('\xa0', '')
                 duration = self.__calculate_duration(start_time, end_time)
+                if row_filter and not row_filter.accepts_duration(duration):
+                    continue
 
                 # program_title and activity columns are always empty because that's what the "client" wanted
                 self.schedule_data.append({
@@ -194,16 +248,44 @@ class ScheduleParser:
         """Set the parsed schedule data directly"""
         self.schedule_data = data
 
-    def save_to_xlsx(self) -> None:
-        """Save parsed schedule to Excel file with proper Polish locale handling"""
-        headers = ['Data', 'Tytuł programu', 'Opis', 'Czynność', 'Liczba godzin', 'Od', 'Do'] if self.schedule_config.is_personal \
-            else ['Data', 'Tytuł programu', 'Opis', 'Czynność', 'Liczba godzin', 'Od', 'Do', 'Montażysta']
+    def get_summary(self) -> Dict[str, pd.DataFrame]:
+        """Aggregate hours per editor per day and per week in one group-by pass"""
+        return summarize_schedule(self.schedule_data, self.schedule_config.is_personal)
 
-        output_file_path = self.schedule_config.get_full_output_path()
-        output_dir = Path(self.schedule_config.output_dir)
-        output_dir.mkdir(parents=True, exist_ok=True)
+    @staticmethod
+    def __format_worksheet(worksheet, df: pd.DataFrame) -> None:
+        """Format the hours column and adjust column widths of a sheet written from the DataFrame"""
+        headers = list(df.columns)
+
+        # Formating the hours column
+        col_idx = headers.index('Liczba godzin') + 1
+        for row in range(2, len(df) + 2):
+            cell = worksheet.cell(row=row, column=col_idx)
+            # Format the cell as number with two decimal places
+            cell.number_format = '#,##0.00'
+
+            # We make sure that the value is a float
+            try:
+                cell.value = float(cell.value)
+            except (ValueError, TypeError):
+                logging.warning(f"Could not convert value {cell.value} to float")
+
+        # Adjust column widths, measured on the DataFrame instead of walking every written cell
+        for idx, header in enumerate(headers, 1):
+            max_length = len(str(header))
+            if len(df):
+                max_length = max(max_length, int(df[header].astype(str).str.len().max()))
+
+            adjusted_width = (max_length + 2)
+            worksheet.column_dimensions[get_column_letter(idx)].width = adjusted_width
+
+    def get_headers(self) -> List[str]:
+        """Return export column headers for the configured schedule type"""
+        return ['Data', 'Tytuł programu', 'Opis', 'Czynność', 'Liczba godzin', 'Od', 'Do'] if self.schedule_config.is_personal \
+            else ['Data', 'Tytuł programu', 'Opis', 'Czynność', 'Liczba godzin', 'Od', 'Do', 'Montażysta']
 
-        # Prepare data for DataFrame
+    def get_rows(self) -> List[List]:
+        """Return parsed schedule data as export rows in header order"""
         data = []
         for entry in self.schedule_data:
             row = [
@@ -218,10 +300,152 @@ class ScheduleParser:
             if not self.schedule_config.is_personal:
                 row.append(entry['editor'])
             data.append(row)
+        return data
 
-        df = pd.DataFrame(data, columns=headers)
+    @staticmethod
+    def __get_date(value) -> Optional[datetime]:
+        """Return the day of a 'Data' cell value, None for cells that are not dates"""
+        if isinstance(value, datetime):
+            date = value
+        else:
+            try:
+                date = datetime.strptime(str(value).strip(), '%d.%m.%Y')
+            except ValueError:
+                return None
+        return date.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    def __get_week(self, value) -> Optional[datetime]:
+        """Return Monday of the week of a 'Data' cell value, None for cells that are not dates"""
+        date = self.__get_date(value)
+        if date is None:
+            return None
+        return date - timedelta(days=date.weekday())
+
+    def __row_to_entry(self, row, headers: List[str]) -> Dict:
+        """Turn a row read back from the workbook into a parsed entry for filters and summaries"""
+        entry = {
+            'date': row[0].strip() if isinstance(row[0], str) else format_row_date(self.__get_date(row[0])),
+            'description': str(row[headers.index('Opis')] or ''),
+            'duration': float(row[headers.index('Liczba godzin')] or 0.0),
+        }
+        if not self.schedule_config.is_personal:
+            entry['editor'] = str(row[headers.index('Montażysta')] or '').strip()
+        return entry
+
+    def __merge_into_workbook(self, output_file_path: Path, headers: List[str], data: List[List]) -> None:
+        """
+        Replace rows of the exported weeks in an existing workbook and append weeks that are not there yet.
+        Rows of all other weeks, as well as any other sheets, are left untouched. With filters set, only
+        rows of the exported weeks that the filters accept are replaced, the rest of the week is kept.
+        """
+        workbook = load_workbook(output_file_path)
+        worksheet = workbook.worksheets[0]
+
+        existing_headers = [cell.value for cell in worksheet[1]]
+        while existing_headers and existing_headers[-1] is None:
+            existing_headers.pop()
+        if existing_headers != headers:
+            raise WorkbookLayoutError(f"Unexpected headers in {output_file_path}: {existing_headers}")
+
+        # Index of already present weeks built from the 'Data' column, as lists of contiguous row blocks
+        week_blocks: Dict[datetime, List[List[int]]] = {}
+        for row_idx, (value,) in enumerate(worksheet.iter_rows(min_row=2, max_col=1, values_only=True), 2):
+            week = self.__get_week(value)
+            if week is None:
+                continue
+            blocks = week_blocks.setdefault(week, [])
+            if blocks and blocks[-1][1] == row_idx - 1:
+                blocks[-1][1] = row_idx
+            else:
+                blocks.append([row_idx, row_idx])
+
+        new_rows: Dict[datetime, List[List]] = {}
+        for row in data:
+            new_rows.setdefault(self.__get_week(row[0]), []).append(row)
+
+        # Rows the filters reject were not exported, so they stay next to the replaced ones
+        row_filter = self.schedule_config.filters
+        if row_filter:
+            for week, rows in new_rows.items():
+                kept = []
+                for first, last in week_blocks.get(week, []):
+                    for row in worksheet.iter_rows(min_row=first, max_row=last, max_col=len(headers),
+                                                   values_only=True):
+                        if not row_filter.accepts_row(self.__row_to_entry(row, headers)):
+                            kept.append(list(row))
+                if kept:
+                    # Stable sort keeps the original order of rows within each day
+                    new_rows[week] = sorted(kept + rows, key=lambda row: self.__get_date(row[0]))
+
+        hours_col = headers.index('Liczba godzin') + 1
+
+        def write_rows(first_row: int, rows: List[List]) -> None:
+            for offset, row in enumerate(rows):
+                for col_idx, value in enumerate(row, 1):
+                    worksheet.cell(row=first_row + offset, column=col_idx, value=value)
+                worksheet.cell(row=first_row + offset, column=hours_col).number_format = '#,##0.00'
+
+        # Replace weeks bottom-up, so row numbers of blocks above stay valid
+        replaced = [(block, week, i == 0) for week in new_rows if week in week_blocks
+                    for i, block in enumerate(week_blocks[week])]
+        for (first, last), week, is_first_block in sorted(replaced, key=lambda item: item[0][0], reverse=True):
+            worksheet.delete_rows(first, last - first + 1)
+            if is_first_block:
+                worksheet.insert_rows(first, len(new_rows[week]))
+                write_rows(first, new_rows[week])
+
+        appended = [week for week in new_rows if week not in week_blocks]
+        for week in sorted(appended, key=lambda w: (w is None, w or datetime.min)):
+            write_rows(worksheet.max_row + 1, new_rows[week])
+
+        # Widen columns if the new values need it
+        for col_idx in range(1, len(headers) + 1):
+            column = worksheet.column_dimensions[get_column_letter(col_idx)]
+            max_length = max((len(str(row[col_idx - 1])) for row in data), default=0)
+            column.width = max(column.width or 0, max_length + 2)
+
+        logging.info(f"Replaced {len(new_rows) - len(appended)} and appended {len(appended)} week(s) "
+                     f"in {output_file_path}")
+
+        # Summary sheets are recomputed for the whole merged history
+        if self.schedule_config.include_summary:
+            entries = []
+            for row in worksheet.iter_rows(min_row=2, max_col=len(headers), values_only=True):
+                if self.__get_date(row[0]) is None:
+                    continue
+                entries.append(self.__row_to_entry(row, headers))
+
+            for sheet_name, summary in summarize_schedule(entries, self.schedule_config.is_personal).items():
+                if sheet_name in workbook.sheetnames:
+                    del workbook[sheet_name]
+                summary_sheet = workbook.create_sheet(sheet_name)
+                summary_sheet.append(list(summary.columns))
+                for row in summary.itertuples(index=False):
+                    summary_sheet.append(list(row))
+                self.__format_worksheet(summary_sheet, summary)
+
+        workbook.save(output_file_path)
+
+    def save_to_xlsx(self) -> None:
+        """Save parsed schedule to Excel file with proper Polish locale handling"""
+        headers = self.get_headers()
+
+        output_file_path = self.schedule_config.get_full_output_path()
+        output_dir = Path(self.schedule_config.output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        # Prepare data for DataFrame
+        data = self.get_rows()
 
         try:
+            # Merge into the existing workbook instead of regenerating the whole file
+            if self.schedule_config.append_to_existing and output_file_path.exists():
+                self.__merge_into_workbook(output_file_path, headers, data)
+                logging.info(f"Schedule merged successfully into {output_file_path}")
+                return
+
+            df = pd.DataFrame(data, columns=headers)
+
             writer = pd.ExcelWriter(
                 output_file_path,
                 engine='openpyxl'
@@ -229,36 +453,13 @@ class ScheduleParser:
 
             # Save DataFrame to Excel
             df.to_excel(writer, index=False)
+            self.__format_worksheet(writer.sheets['Sheet1'], df)
 
-            # Access the sheet
-            worksheet = writer.sheets['Sheet1']
-
-            # Formating the hours column
-            col_idx = headers.index('Liczba godzin') + 1
-            for row in range(2, len(df) + 2):
-                cell = worksheet.cell(row=row, column=col_idx)
-                # Format the cell as number with two decimal places
-                cell.number_format = '#,##0.00'
-
-                # We make sure that the value is a float
-                try:
-                    cell.value = float(cell.value)
-                except (ValueError, TypeError):
-                    logging.warning(f"Could not convert value {cell.value} to float")
-
-            # Adjust column widths
-            for idx, col in enumerate(worksheet.columns, 1):
-                max_length = 0
-                column = worksheet.column_dimensions[chr(64 + idx)]
-
-                for cell in col:
-                    try:
-                        max_length = max(max_length, len(str(cell.value)))
-                    except TypeError:
-                        pass
-
-                adjusted_width = (max_length + 2)
-                column.width = adjusted_width
+            # Summary sheets with precomputed hour totals
+            if self.schedule_config.include_summary:
+                for sheet_name, summary in self.get_summary().items():
+                    summary.to_excel(writer, sheet_name=sheet_name, index=False)
+                    self.__format_worksheet(writer.sheets[sheet_name], summary)
 
             writer.close()
             logging.info(f"Schedule saved successfully to {output_file_path}")
@@ -267,7 +468,56 @@ class ScheduleParser:
             logging.error(f"Permission denied when saving to {output_file_path}")
             raise PermissionError({"title": "Błąd w dostępie do pliku!",
                                    "message": f"Brak uprawnień do zapisu pliku: \nSprawdź, czy {output_file_path} nie jest otwarty w innym programie."})
+        except WorkbookLayoutError as e:
+            logging.error(f"Error merging into Excel file: {str(e)}")
+            raise Exception({"title": "Niezgodny plik!",
+                             "message": f"Plik {output_file_path} ma inne kolumny niż wybrany grafik. Wybierz inny plik."})
         except Exception as e:
             logging.error(f"Error saving Excel file: {str(e)}")
             raise Exception({"title": "Nieznany błąd zapisu pliku!",
-                             "message": "Coś poszło nie tak podczas zapisu pliku. Spróbuj ponownie."})
\ No newline at end of file
+                             "message": "Coś poszło nie tak podczas zapisu pliku. Spróbuj ponownie."})
+
+
+def format_row_date(date: datetime) -> str:
+    """Format a date like the parser writes it into rows, e.g. '1.01.2025'"""
+    return f"{date.day}.{date.month:02d}.{date.year}"
+
+
+def summarize_schedule(schedule_data: List[Dict], is_personal: bool) -> Dict[str, pd.DataFrame]:
+    """
+    Compute total hours per editor per day and per week from parsed schedule rows.
+    Rows spanning midnight count fully towards their start date, like the parser's duration calculation.
+    Returns a mapping of summary sheet name to DataFrame.
+    """
+    group_columns = [] if is_personal else ['Montażysta']
+    day_columns = ['Data'] + group_columns + ['Liczba godzin']
+    week_columns = ['Tydzień'] + group_columns + ['Liczba godzin']
+
+    if not schedule_data:
+        return {
+            SUMMARY_DAY_SHEET: pd.DataFrame(columns=day_columns),
+            SUMMARY_WEEK_SHEET: pd.DataFrame(columns=week_columns),
+        }
+
+    df = pd.DataFrame({
+        'Data': pd.to_datetime([entry['date'] for entry in schedule_data], format='%d.%m.%Y'),
+        'Liczba godzin': [float(entry['duration']) for entry in schedule_data],
+    })
+    if not is_personal:
+        df['Montażysta'] = [entry['editor'] for entry in schedule_data]
+
+    # Weeks start on Monday, same as the scraper's week range
+    df['Tydzień'] = df['Data'] - pd.to_timedelta(df['Data'].dt.weekday, unit='D')
+
+    per_day = df.groupby(['Data'] + group_columns, sort=True)['Liczba godzin'].sum().round(2).reset_index()
+    per_week = df.groupby(['Tydzień'] + group_columns, sort=True)['Liczba godzin'].sum().round(2).reset_index()
+
+    # Dates are written like in the rows sheet, so they can be looked up across sheets
+    row_dates = dict(zip(df['Data'], (entry['date'] for entry in schedule_data)))
+    per_day['Data'] = per_day['Data'].map(row_dates)
+    per_week['Tydzień'] = per_week['Tydzień'].map(format_row_date)
+
+    return {
+        SUMMARY_DAY_SHEET: per_day[day_columns],
+        SUMMARY_WEEK_SHEET: per_week[week_columns],
+    }
@@ -0,0 +1,135 @@
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import List, Dict
+
+from config import SchedulePeriod, ScraperConfig, ScheduleFilter
+
+
+class PlanError(ValueError):
+    """Raised when requested periods can't be planned"""
+    pass
+
+
+@dataclass
+class WeekFetchPlan:
+    """Minimal set of weeks to fetch for a list of periods, and which weeks each period needs"""
+    weeks: List[str]
+    period_weeks: Dict[str, List[str]] = field(default_factory=dict)
+    estimated_seconds: float = 0.0
+
+    @property
+    def requested_weeks(self) -> int:
+        """Number of week fetches if every period was downloaded separately"""
+        return sum(len(weeks) for weeks in self.period_weeks.values())
+
+    def describe(self) -> str:
+        """Human readable summary of the plan, shown before the download starts"""
+        minutes, seconds = divmod(int(round(self.estimated_seconds)), 60)
+        return (f"Okresy: {len(self.period_weeks)}\n"
+                f"Tygodnie do pobrania: {len(self.weeks)} (zamiast {self.requested_weeks})\n"
+                f"Szacowany czas: {minutes} min {seconds} s")
+
+
+def parse_date(date: str) -> datetime:
+    """Parse date string in format DD.MM.YYYY to datetime object"""
+    return datetime.strptime(date, '%d.%m.%Y')
+
+
+def format_date(date: datetime) -> str:
+    """Format datetime object to string in format DD.MM.YYYY"""
+    return date.strftime('%d.%m.%Y')
+
+
+def get_week_start(date: datetime) -> datetime:
+    """Return Monday of the week containing the date"""
+    return date - timedelta(days=date.weekday())
+
+
+def week_period(date: str, name: str = None) -> SchedulePeriod:
+    """Period covering the whole week (Monday to Sunday) that contains the date"""
+    monday = get_week_start(parse_date(date))
+    return SchedulePeriod(name=name or f"tydzień {format_date(monday)}",
+                          start_date=format_date(monday),
+                          end_date=format_date(monday + timedelta(days=6)))
+
+
+def first_weeks_of_months(start_date: str, end_date: str) -> List[SchedulePeriod]:
+    """Periods for the week containing the 1st day of every month between the dates"""
+    current = parse_date(start_date).replace(day=1)
+    end = parse_date(end_date)
+    periods = []
+    while current <= end:
+        periods.append(week_period(format_date(current), name=current.strftime('%Y-%m')))
+        current = (current + timedelta(days=32)).replace(day=1)
+    return periods
+
+
+def check_periods_export(periods: List[SchedulePeriod], shard_by: str = None) -> None:
+    """Periods are already written one file per period, they can't be split further"""
+    if periods and shard_by:
+        raise PlanError({"title": "Niepoprawne ustawienia eksportu",
+                         "message": "Lista zakresów zapisuje każdy zakres do osobnego pliku, "
+                                    "wyłącz podział na pliki albo wyczyść listę zakresów."})
+
+
+def plan_fetches(periods: List[SchedulePeriod], scraper_config: ScraperConfig = None,
+                 row_filter: ScheduleFilter = None) -> WeekFetchPlan:
+    """
+    Deduplicate the weeks of all periods into a single, chronologically ordered fetch list.
+    Weeks outside the date range of the row filter are left out, the filter would reject their rows anyway.
+    """
+    scraper_config = scraper_config or ScraperConfig()
+
+    if not periods:
+        raise PlanError({"title": "Brak okresów", "message": "Nie wybrano żadnego okresu do pobrania."})
+
+    period_weeks: Dict[str, List[str]] = {}
+    all_weeks = set()
+    for period in periods:
+        if period.name in period_weeks:
+            raise PlanError({"title": "Powtórzony okres", "message": f"Okres '{period.name}' występuje więcej niż raz."})
+
+        start = parse_date(period.start_date)
+        end = parse_date(period.end_date)
+        if end < start:
+            raise PlanError({"title": "Niepoprawny okres",
+                             "message": f"Okres '{period.name}' kończy się przed swoim początkiem."})
+
+        if row_filter and row_filter.start_date:
+            start = max(start, parse_date(row_filter.start_date))
+        if row_filter and row_filter.end_date:
+            end = min(end, parse_date(row_filter.end_date))
+
+        weeks = []
+        current = get_week_start(start)
+        while current <= end:
+            weeks.append(current)
+            current += timedelta(days=7)
+
+        period_weeks[period.name] = [format_date(week) for week in weeks]
+        all_weeks.update(weeks)
+
+    weeks = [format_date(week) for week in sorted(all_weeks)]
+    return WeekFetchPlan(weeks=weeks,
+                         period_weeks=period_weeks,
+                         estimated_seconds=len(weeks) * scraper_config.estimated_week_seconds)
+
+
+def within_periods(periods: List[SchedulePeriod], schedule_data: List[Dict]) -> List[Dict]:
+    """Keep rows whose date falls into at least one of the periods, each row at most once"""
+    bounds = [(parse_date(period.start_date), parse_date(period.end_date)) for period in periods]
+    return [entry for entry in schedule_data
+            if any(start <= parse_date(entry['date']) <= end for start, end in bounds)]
+
+
+def fan_out(periods: List[SchedulePeriod], schedule_data: List[Dict]) -> Dict[str, List[Dict]]:
+    """Assign fetched rows to every period whose dates they fall in, a row can belong to several periods"""
+    bounds = [(period.name, parse_date(period.start_date), parse_date(period.end_date)) for period in periods]
+    result: Dict[str, List[Dict]] = {name: [] for name, _, _ in bounds}
+
+    for entry in schedule_data:
+        date = parse_date(entry['date'])
+        for name, start, end in bounds:
+            if start <= date <= end:
+                result[name].append(entry)
+    return result
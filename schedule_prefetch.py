@@ -0,0 +1,106 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, Future
+from dataclasses import replace
+from datetime import datetime, timedelta
+from typing import List, Dict, Optional, Tuple
+
+from config import ScheduleConfig, SchedulePeriod
+from schedule_scraper import ScheduleScraper, ScheduleFetchError
+
+
+class WeekPrefetcher:
+    """
+    Speculatively logs in and fetches the selected weeks in the background, before the download is requested.
+    Weeks that fall out of the selection are cancelled if they haven't started yet,
+    fetched weeks are refetched once they are older than cache_ttl seconds.
+    """
+
+    def __init__(self, schedule_config: ScheduleConfig, margin_weeks: int = 1, cache_ttl: int = 900):
+        # Weeks are cached unfiltered, filters are applied by the scraper that consumes them
+        self.schedule_config = replace(schedule_config, filters=None)
+        self.margin_weeks = margin_weeks
+        self.cache_ttl = cache_ttl
+        self.scraper = ScheduleScraper(self.schedule_config)
+        # The scraper holds a single requests.Session, so weeks are fetched one at a time by a single worker
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='prefetch')
+        self._lock = threading.Lock()
+        # Week -> (time the fetch was started, future with its rows)
+        self._futures: Dict[str, Tuple[float, Future]] = {}
+        # The shared service fetches upstream with its own login, the user's credentials aren't sent anywhere
+        self._login: Optional[Future] = None
+        if not self.scraper.uses_service():
+            self._login = self._executor.submit(self.scraper.login)
+
+    def matches(self, schedule_config: ScheduleConfig) -> bool:
+        """Check whether weeks fetched by this prefetcher can be used for the given settings"""
+        return (schedule_config.username == self.schedule_config.username
+                and schedule_config.password == self.schedule_config.password
+                and schedule_config.is_personal == self.schedule_config.is_personal)
+
+    def __plan(self, start_date: str, end_date: str, periods: Optional[List[SchedulePeriod]]) -> List[str]:
+        """Weeks of the selection first, followed by the surrounding weeks"""
+        selection = replace(self.schedule_config, start_date=start_date, end_date=end_date, periods=periods)
+        weeks = ScheduleScraper(selection).get_dates_in_range()
+
+        first = datetime.strptime(weeks[0], '%d.%m.%Y')
+        last = datetime.strptime(weeks[-1], '%d.%m.%Y')
+        for i in range(1, self.margin_weeks + 1):
+            weeks.append((last + timedelta(weeks=i)).strftime('%d.%m.%Y'))
+            weeks.append((first - timedelta(weeks=i)).strftime('%d.%m.%Y'))
+        return weeks
+
+    def __fetch(self, week: str) -> List[Dict]:
+        # Raises LoginError if the background login failed
+        if self._login is not None:
+            self._login.result()
+        rows = self.scraper.fetch_week(week)
+        if rows is None:
+            raise ScheduleFetchError({"title": "Błąd pobierania grafiku",
+                                      "message": f"Nie udało się pobrać grafiku dla tygodnia {week}."})
+        logging.info(f"Prefetched schedule for week starting {week}")
+        return rows
+
+    def update_selection(self, start_date: str, end_date: str,
+                         periods: Optional[List[SchedulePeriod]] = None) -> None:
+        """
+        Start fetching weeks of a new selection and cancel queued weeks that are no longer needed.
+        The periods, when given, replace the start and end date like in ScheduleConfig.
+        """
+        weeks = self.__plan(start_date, end_date, periods)
+        wanted = set(weeks)
+
+        with self._lock:
+            for week, (_, future) in list(self._futures.items()):
+                if week not in wanted and future.cancel():
+                    del self._futures[week]
+
+            for week in weeks:
+                # Failed and expired weeks are refetched, fresh and in-flight ones are kept
+                if self.__get_fresh(week) is None:
+                    self._futures[week] = (time.monotonic(), self._executor.submit(self.__fetch, week))
+
+    def __get_fresh(self, week: str) -> Optional[Future]:
+        """Return the future of a week unless it failed or its rows are older than cache_ttl"""
+        started_at, future = self._futures.get(week, (0.0, None))
+        if future is None or not future.done():
+            return future
+        if future.exception() is not None or time.monotonic() - started_at >= self.cache_ttl:
+            return None
+        return future
+
+    def get(self, week: str, timeout: Optional[float] = None) -> Optional[List[Dict]]:
+        """Return rows of a prefetched week, waiting for it if it is in flight; None if it isn't available"""
+        with self._lock:
+            future = self.__get_fresh(week)
+        if future is None:
+            return None
+        try:
+            return future.result(timeout=timeout)
+        except Exception:
+            return None
+
+    def shutdown(self) -> None:
+        """Stop the background work, queued weeks are dropped"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,265 @@
+import logging
+import queue
+import threading
+import tkinter as tk
+from tkinter import messagebox
+from typing import List, Dict, Tuple, Optional
+
+import customtkinter as ctk
+
+from config import ScheduleConfig
+from schedule_export import export_rows
+from schedule_scraper import ScheduleScraper
+
+
+def _date_sort_key(entry: Dict) -> Tuple:
+    """Sort dates like '6.01.2025' chronologically, then by start time"""
+    day, month, year = entry['date'].split('.')
+    return int(year), int(month), int(day), entry.get('start_time', '')
+
+
+SORT_KEYS = {
+    'date': _date_sort_key,
+    'duration': lambda entry: float(entry['duration']),
+}
+
+
+class VirtualTable(ctk.CTkFrame):
+    """
+    Table that only creates widgets for the visible rows. Scrolling relabels the same widgets,
+    so the widget count stays constant regardless of how many rows the table holds.
+    """
+
+    def __init__(self, parent, columns: List[Tuple[str, str, int]], theme_colors: Dict[str, str],
+                 visible_rows: int = 20, **kwargs):
+        super().__init__(parent, fg_color=theme_colors["section_bg"], corner_radius=8, **kwargs)
+        # Columns as (entry key, header text, width in characters)
+        self.columns = columns
+        self.visible_rows = visible_rows
+        self.rows: List[Dict] = []
+        self.first_row = 0
+        self.sort_key: Optional[str] = None
+        self.sort_reverse = False
+
+        body = tk.Frame(self, bg=theme_colors["section_bg"])
+        body.pack(side="left", fill="both", expand=True, padx=(5, 0), pady=5)
+
+        self.header_buttons = {}
+        for col_idx, (key, header, width) in enumerate(columns):
+            button = ctk.CTkButton(body, text=header, width=width * 7, height=24,
+                                   command=lambda k=key: self.sort_by(k))
+            button.grid(row=0, column=col_idx, sticky="ew", padx=1, pady=(0, 2))
+            self.header_buttons[key] = button
+
+        self.cells: List[List[tk.Label]] = []
+        for row_idx in range(visible_rows):
+            labels = []
+            for col_idx, (_, _, width) in enumerate(columns):
+                label = tk.Label(body, width=width, anchor="w", bg=theme_colors["section_bg"],
+                                 fg=theme_colors["label_fg"])
+                label.grid(row=row_idx + 1, column=col_idx, sticky="ew", padx=1)
+                label.bind("<MouseWheel>", self._on_mouse_wheel)
+                label.bind("<Button-4>", lambda _: self.scroll_to(self.first_row - 3))
+                label.bind("<Button-5>", lambda _: self.scroll_to(self.first_row + 3))
+                labels.append(label)
+            self.cells.append(labels)
+
+        self.scrollbar = ctk.CTkScrollbar(self, command=self._on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y", padx=(0, 5), pady=5)
+        self._refresh()
+
+    def set_rows(self, rows: List[Dict]) -> None:
+        """Replace all rows of the table"""
+        self.rows = list(rows)
+        self.__sort()
+        self._refresh()
+
+    def append_rows(self, rows: List[Dict]) -> None:
+        """Add rows as they arrive, keeping the current sort order"""
+        self.rows.extend(rows)
+        if self.sort_key is not None:
+            self.__sort()
+        self._refresh()
+
+    def sort_by(self, key: str) -> None:
+        """Sort by a column, clicking the same column again reverses the order"""
+        self.sort_reverse = not self.sort_reverse if self.sort_key == key else False
+        self.sort_key = key
+        self.__sort()
+        self.first_row = 0
+        self._refresh()
+
+    def __sort(self) -> None:
+        if self.sort_key is None:
+            return
+        key = SORT_KEYS.get(self.sort_key, lambda entry, k=self.sort_key: str(entry.get(k, '')).lower())
+        self.rows.sort(key=key, reverse=self.sort_reverse)
+
+    def scroll_to(self, first_row: int) -> None:
+        """Show rows starting at the given index"""
+        max_first = max(0, len(self.rows) - self.visible_rows)
+        self.first_row = min(max(0, first_row), max_first)
+        self._refresh()
+
+    def _on_scrollbar(self, action, *args):
+        if action == "moveto":
+            self.scroll_to(int(float(args[0]) * len(self.rows)))
+        elif action == "scroll":
+            step = self.visible_rows if args[1] == "pages" else 1
+            self.scroll_to(self.first_row + int(args[0]) * step)
+
+    def _on_mouse_wheel(self, event):
+        # Windows reports multiples of 120, macOS small deltas
+        delta = event.delta // 120 if abs(event.delta) >= 120 else event.delta
+        self.scroll_to(self.first_row - delta * 3)
+
+    def _refresh(self) -> None:
+        """Relabel the widget pool with the rows currently in view"""
+        for row_idx, labels in enumerate(self.cells):
+            data_idx = self.first_row + row_idx
+            entry = self.rows[data_idx] if data_idx < len(self.rows) else None
+            for label, (key, _, _) in zip(labels, self.columns):
+                value = '' if entry is None else entry.get(key, '')
+                if key == 'duration' and entry is not None:
+                    value = f"{float(value):.2f}"
+                label.configure(text=value)
+
+        for key, button in self.header_buttons.items():
+            header = next(h for k, h, _ in self.columns if k == key)
+            arrow = (' ▼' if self.sort_reverse else ' ▲') if key == self.sort_key else ''
+            button.configure(text=header + arrow)
+
+        if self.rows:
+            start = self.first_row / len(self.rows)
+            end = min(1.0, (self.first_row + self.visible_rows) / len(self.rows))
+            self.scrollbar.set(start, end)
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+
+class SchedulePreviewWindow(ctk.CTkToplevel):
+    """Shows parsed rows while the weeks are being fetched and allows exporting them afterwards"""
+
+    def __init__(self, parent, schedule_config: ScheduleConfig, theme_colors: Dict[str, str], week_cache=None):
+        super().__init__(parent, fg_color=theme_colors["main_bg"])
+        self.title("GrafikPlus - podgląd")
+        self.geometry("1000x700")
+
+        self.schedule_config = schedule_config
+        self.week_cache = week_cache
+        self.entries: List[Dict] = []
+        self.totals: Dict[str, float] = {}
+        self.total_key = 'date' if schedule_config.is_personal else 'editor'
+        self.fetched_weeks = 0
+        self.finished = False
+        self._rows_queue = queue.Queue()
+        self._stop_event = threading.Event()
+        self._poll_job = None
+
+        columns = [('date', 'Data', 11), ('description', 'Opis', 48), ('duration', 'Liczba godzin', 12),
+                   ('start_time', 'Od', 6), ('end_time', 'Do', 6)]
+        if not schedule_config.is_personal:
+            columns.append(('editor', 'Montażysta', 22))
+
+        self.status_label = ctk.CTkLabel(self, text="Pobieranie...", text_color=theme_colors["label_fg"])
+        self.status_label.pack(pady=(10, 5))
+
+        tables_frame = ctk.CTkFrame(self, fg_color=theme_colors["main_bg"])
+        tables_frame.pack(fill="both", expand=True, padx=10)
+
+        self.table = VirtualTable(tables_frame, columns, theme_colors, visible_rows=24)
+        self.table.pack(side="left", fill="both", expand=True, padx=(0, 5))
+
+        total_header = 'Data' if schedule_config.is_personal else 'Montażysta'
+        self.totals_table = VirtualTable(tables_frame, [(self.total_key, total_header, 20), ('duration', 'Suma godzin', 11)],
+                                         theme_colors, visible_rows=24)
+        self.totals_table.pack(side="right", fill="y")
+
+        self.export_button = ctk.CTkButton(
+            self,
+            text="Eksportuj do pliku",
+            command=self.export,
+            state="disabled",
+            fg_color=theme_colors["button_download"],
+            text_color="black",
+            font=ctk.CTkFont(size=16, weight="bold")
+        )
+        self.export_button.pack(pady=10)
+
+        self.protocol("WM_DELETE_WINDOW", self.on_closing)
+
+        threading.Thread(target=self.__fetch_rows, daemon=True).start()
+        self._poll_job = self.after(100, self.__poll)
+
+    def __fetch_rows(self) -> None:
+        """Worker thread, hands each fetched week over to the GUI thread through the queue"""
+        try:
+            scraper = ScheduleScraper(self.schedule_config, week_cache=self.week_cache)
+            for _, rows in scraper.iter_weeks():
+                if self._stop_event.is_set():
+                    return
+                self._rows_queue.put(rows)
+        except Exception as e:
+            logging.error(f"Error fetching preview: {e}")
+            self._rows_queue.put(e)
+        self._rows_queue.put(None)
+
+    def __poll(self) -> None:
+        """Moves fetched rows into the tables, all batches that arrived since the last poll at once"""
+        self._poll_job = None
+        batch = []
+        while True:
+            try:
+                item = self._rows_queue.get_nowait()
+            except queue.Empty:
+                break
+
+            if item is None:
+                self.finished = True
+            elif isinstance(item, Exception):
+                details = item.args[0] if item.args and isinstance(item.args[0], dict) else \
+                    {"title": "Błąd pobierania grafiku", "message": str(item)}
+                messagebox.showerror(details["title"], details["message"], parent=self)
+            else:
+                self.fetched_weeks += 1
+                batch.extend(item)
+
+        if batch:
+            self.entries.extend(batch)
+            self.table.append_rows(batch)
+            for entry in batch:
+                key = entry.get(self.total_key, '')
+                self.totals[key] = self.totals.get(key, 0.0) + float(entry['duration'])
+            self.totals_table.set_rows([{self.total_key: key, 'duration': round(hours, 2)}
+                                        for key, hours in self.totals.items()])
+
+        status = "Pobrano" if self.finished else "Pobieranie..."
+        self.status_label.configure(text=f"{status} Tygodnie: {self.fetched_weeks}, wiersze: {len(self.entries)}")
+
+        if self.finished:
+            if self.entries:
+                self.export_button.configure(state="normal")
+        else:
+            self._poll_job = self.after(100, self.__poll)
+
+    def export(self) -> None:
+        """Save the previewed rows like the regular download would, in the order they were fetched"""
+        try:
+            export_rows(self.schedule_config, list(self.entries))
+        except Exception as e:
+            details = e.args[0]
+            messagebox.showerror(details["title"], details["message"], parent=self)
+            return
+        if self.schedule_config.periods or self.schedule_config.shard_by:
+            message = f"Zapisano pliki w katalogu {self.schedule_config.output_dir}"
+        else:
+            message = f"Zapisano plik {self.schedule_config.get_full_output_path()}"
+        messagebox.showinfo("Eksport zakończony", message, parent=self)
+
+    def on_closing(self) -> None:
+        self._stop_event.set()
+        # destroy() deletes the Tcl command of the pending poll, it must not fire afterwards
+        if self._poll_job is not None:
+            self.after_cancel(self._poll_job)
+            self._poll_job = None
+        self.destroy()
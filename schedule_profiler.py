@@ -0,0 +1,113 @@
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import List, Tuple, Optional, Iterable, Set
+
+PROFILE_ENV_VAR = 'GRAFIKPLUS_PROFILE'
+
+
+def is_profiling_requested() -> bool:
+    """Profiling can be switched on with GRAFIKPLUS_PROFILE=1 or the --profile command line flag"""
+    return os.environ.get(PROFILE_ENV_VAR, '').lower() in ('1', 'true', 'yes') or '--profile' in sys.argv
+
+
+class SamplingProfiler:
+    """
+    Low overhead sampling profiler. A background thread periodically records the call stacks
+    of the profiled threads, so the profiled code itself runs unmodified. By default only the thread
+    that starts the profiler is sampled, idle workers of other pools would drown out the real work.
+    """
+
+    def __init__(self, interval: float = 0.005, threads: Optional[Iterable[int]] = None):
+        self.interval = interval
+        # Thread identifiers to sample, None samples the thread calling start()
+        self.threads: Optional[Set[int]] = set(threads) if threads is not None else None
+        self.samples: Counter = Counter()
+        self.sample_count = 0
+        self.duration = 0.0
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._started_at = 0.0
+        self._sampled_threads: Set[int] = set()
+
+    @staticmethod
+    def __describe_frame(frame) -> str:
+        code = frame.f_code
+        return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+    def __sample(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id not in self._sampled_threads:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(self.__describe_frame(frame))
+                    frame = frame.f_back
+                # Collapsed stacks go from the root to the leaf
+                self.samples[tuple(reversed(stack))] += 1
+            self.sample_count += 1
+
+    def start(self) -> None:
+        self._stop_event.clear()
+        self._sampled_threads = self.threads if self.threads is not None else {threading.get_ident()}
+        self._started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self.__sample, name='sampling-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.duration = time.perf_counter() - self._started_at
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+        return False
+
+    def top_functions(self, limit: int = 25) -> List[Tuple[str, int, int]]:
+        """Return (function, self samples, total samples) of the hottest functions by self samples"""
+        self_samples: Counter = Counter()
+        total_samples: Counter = Counter()
+        for stack, count in self.samples.items():
+            self_samples[stack[-1]] += count
+            # A recursive function counts once per stack
+            for function in set(stack):
+                total_samples[function] += count
+        return [(function, count, total_samples[function]) for function, count in self_samples.most_common(limit)]
+
+    def write_collapsed(self, path: Path) -> None:
+        """Write stacks in the collapsed format read by flamegraph.pl, speedscope and similar tools"""
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{';'.join(stack)} {count}\n")
+
+    def write_report(self, path: Path, limit: int = 25) -> None:
+        """Write the hottest functions as a plain text table"""
+        total = sum(self.samples.values()) or 1
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(f"Duration: {self.duration:.2f} s, sampling rounds: {self.sample_count}, "
+                    f"interval: {self.interval * 1000:.1f} ms\n\n")
+            f.write(f"{'self %':>7} {'total %':>8}  function\n")
+            for function, self_count, total_count in self.top_functions(limit):
+                f.write(f"{self_count / total * 100:7.1f} {total_count / total * 100:8.1f}  {function}\n")
+
+    def save(self, output_dir: str, stem: str) -> Tuple[Path, Path]:
+        """Write the collapsed stacks and the top functions report next to the exported file"""
+        directory = Path(output_dir)
+        directory.mkdir(parents=True, exist_ok=True)
+        collapsed_path = directory / f"{stem}_profile.folded"
+        report_path = directory / f"{stem}_profile_top.txt"
+        self.write_collapsed(collapsed_path)
+        self.write_report(report_path)
+        logging.info(f"Profile saved to {collapsed_path} and {report_path}")
+        return collapsed_path, report_path
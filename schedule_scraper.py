@@ -1,11 +1,18 @@
 import logging
-from typing import Optional, List
+from typing import Optional, List, Dict, Iterator, Tuple
 from datetime import datetime, timedelta
+from pathlib import Path
 import os
+import re
+from urllib.parse import urlparse
 import requests
 
 from config import ScheduleConfig, ScraperConfig
+from schedule_checkpoint import ScheduleCheckpoint
+from schedule_export import export_rows
 from schedule_parser import ScheduleParser
+from schedule_planner import WeekFetchPlan, check_periods_export, plan_fetches, within_periods
+from schedule_profiler import SamplingProfiler
 
 # Configure logging
 logging.basicConfig(
@@ -18,6 +25,9 @@ logging.basicConfig(
 )
 
 
+LOGIN_ERROR_MESSAGE = "Niepoprawny identyfikator lub hasło."
+
+
 class LoginError(Exception):
     """Raised when login fails"""
     pass
@@ -29,11 +39,14 @@ class ScheduleFetchError(Exception):
 
 
 class ScheduleScraper:
-    def __init__(self, schedule_config: ScheduleConfig):
+    def __init__(self, schedule_config: ScheduleConfig, week_cache=None):
         self.config = ScraperConfig()
         self.session = requests.Session()
         self.schedule_data = []
         self.schedule_config = schedule_config
+        # Optional source of already fetched weeks (e.g. WeekPrefetcher), anything with get(date) -> rows or None
+        self.week_cache = week_cache
+        self.logged_in = False
 
     @staticmethod
     def __convert_date_to_url_format(date: str) -> str:
@@ -52,8 +65,23 @@ class ScheduleScraper:
         """Format datetime object to string in format DD.MM.YYYY"""
         return date.strftime("%d.%m.%Y")
 
-    def __get_dates_in_range(self) -> List[str]:
+    def get_fetch_plan(self) -> WeekFetchPlan:
+        """Plan the weeks to fetch for the configured periods, or for the single start/end range"""
+        if self.schedule_config.periods:
+            check_periods_export(self.schedule_config.periods, self.schedule_config.shard_by)
+            return plan_fetches(self.schedule_config.periods, self.config, self.schedule_config.filters)
+
+        dates = self.get_dates_in_range()
+        name = f"{self.schedule_config.start_date} - {self.schedule_config.end_date}"
+        return WeekFetchPlan(weeks=dates, period_weeks={name: dates},
+                             estimated_seconds=len(dates) * self.config.estimated_week_seconds)
+
+    def get_dates_in_range(self) -> List[str]:
         """Get first day of each week in range from start_date to end_date"""
+        # Several disjoint periods are deduplicated into the minimal set of weeks
+        if self.schedule_config.periods:
+            return plan_fetches(self.schedule_config.periods, self.config, self.schedule_config.filters).weeks
+
         start_date = self.__parse_date(self.schedule_config.start_date)
         end_date = self.__parse_date(self.schedule_config.end_date)
 
@@ -61,6 +89,13 @@ class ScheduleScraper:
         if end_date < start_date:
             start_date, end_date = end_date, start_date
 
+        # Don't fetch weeks that the date filter would reject anyway
+        row_filter = self.schedule_config.filters
+        if row_filter and row_filter.start_date:
+            start_date = max(start_date, self.__parse_date(row_filter.start_date))
+        if row_filter and row_filter.end_date:
+            end_date = min(end_date, self.__parse_date(row_filter.end_date))
+
         # Get first day of each week in range
         dates = []
 
@@ -77,23 +112,45 @@ class ScheduleScraper:
 
         return dates
 
+    def get_login_payload(self) -> Dict[str, str]:
+        """Return form data for the login request"""
+        return {
+            'username': self.schedule_config.username,
+            'password': self.schedule_config.password
+        }
+
+    @staticmethod
+    def is_login_rejected(response_text: str) -> bool:
+        """Check for error message in login response"""
+        return LOGIN_ERROR_MESSAGE in response_text
+
+    def is_session_expired(self, final_url: str, response_text: str) -> bool:
+        """An expired session is redirected to the login page, which answers 200 and parses to an empty week"""
+        login_path = urlparse(self.config.login_url).path.rstrip('/').lower()
+        if urlparse(final_url).path.rstrip('/').lower() == login_path:
+            return True
+        return re.search(rf'<form[^>]*action="[^"]*{re.escape(login_path)}', response_text, re.IGNORECASE) is not None
+
+    def get_schedule_url(self, date: str) -> str:
+        """Return schedule URL for the week starting on the given date"""
+        schedule_url = self.config.personal_schedule_url if self.schedule_config.is_personal else self.config.general_schedule_url
+
+        date_url = self.__convert_date_to_url_format(date)
+
+        return schedule_url + f"?date={date_url}"  # Add date to URL
+
     def __login(self) -> bool:
         """Perform login to the system"""
         try:
-            payload = {
-                'username': self.schedule_config.username,
-                'password': self.schedule_config.password
-            }
             response = self.session.post(
                 self.config.login_url,
-                data=payload,
+                data=self.get_login_payload(),
                 timeout=self.config.request_timeout
             )
             response.raise_for_status()
 
             # Check for error message in response
-            error_message = "Niepoprawny identyfikator lub hasło."
-            if error_message in response.text:
+            if self.is_login_rejected(response.text):
                 logging.error("Invalid credentials")
                 return False
 
@@ -105,11 +162,7 @@ class ScheduleScraper:
 
     def __fetch_schedule(self, date: str) -> Optional[str]:
         """Fetch schedule HTML content for a specific date"""
-        schedule_url = self.config.personal_schedule_url if self.schedule_config.is_personal else self.config.general_schedule_url
-
-        date_url = self.__convert_date_to_url_format(date)
-
-        schedule_url += f"?date={date_url}"  # Add date to URL
+        schedule_url = self.get_schedule_url(date)
 
         try:
             response = self.session.get(
@@ -117,40 +170,155 @@ class ScheduleScraper:
                 timeout=self.config.request_timeout
             )
             response.raise_for_status()
-            return response.text
         except requests.exceptions.RequestException as e:
             logging.error(f"Error fetching schedule for date {date}: {e}")
             return None
 
-    def scrape_schedule(self):
-        """Main execution function"""
+        if self.is_session_expired(response.url, response.text):
+            logging.warning(f"Session expired while fetching schedule for date {date}")
+            self.logged_in = False
+            return None
+        return response.text
+
+    def uses_service(self) -> bool:
+        """The shared schedule service only serves the general schedule"""
+        return bool(self.schedule_config.service_url) and not self.schedule_config.is_personal
+
+    def get_service_week_url(self) -> str:
+        """Return URL of the shared service endpoint serving parsed weeks"""
+        return f"{self.schedule_config.service_url.rstrip('/')}/week"
+
+    def get_service_headers(self) -> Dict[str, str]:
+        """Return headers authorizing requests to the shared service"""
+        if not self.schedule_config.service_token:
+            return {}
+        return {'Authorization': f"Bearer {self.schedule_config.service_token}"}
+
+    def apply_filters(self, rows: List[Dict]) -> List[Dict]:
+        """Apply configured filters to rows parsed elsewhere, e.g. by the shared service"""
+        row_filter = self.schedule_config.filters
+        if row_filter:
+            rows = [row for row in rows if row_filter.accepts_row(row)]
+        return rows
+
+    def parse_week(self, html_content: str) -> List[Dict]:
+        """Parse schedule HTML of a single week"""
+        parser = ScheduleParser(html_content, self.schedule_config)
+        parser.parse_schedule()
+        return parser.get_parsed_data()
+
+    def __fetch_week_from_service(self, date: str) -> Optional[List[Dict]]:
+        """Fetch parsed rows of a week from the shared schedule service"""
+        try:
+            response = self.session.get(
+                self.get_service_week_url(),
+                params={'date': date},
+                headers=self.get_service_headers(),
+                timeout=self.config.request_timeout
+            )
+            response.raise_for_status()
+            rows = response.json()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logging.error(f"Error fetching schedule for date {date} from service: {e}")
+            return None
+
+        # The service caches unfiltered weeks, filters are applied on our side
+        return self.apply_filters(rows)
+
+    def login(self) -> None:
+        """Log in to the system, raises LoginError on failure"""
         if not self.__login():
             logging.error("Login failed")
             raise LoginError({"title": "Błąd uwierzytelniania", "message": "Niepoprawny identyfikator lub hasło."})
+        self.logged_in = True
+
+    def fetch_week(self, date: str) -> Optional[List[Dict]]:
+        """Fetch and parse the week starting on the given date, None if it could not be fetched"""
+        if self.week_cache is not None:
+            rows = self.week_cache.get(date)
+            if rows is not None:
+                return self.apply_filters(rows)
+
+        if self.uses_service():
+            return self.__fetch_week_from_service(date)
+
+        # Login lazily, so a run served entirely from cache doesn't log in at all
+        if not self.logged_in:
+            self.login()
+
+        html_content = self.__fetch_schedule(date)
+        # The session expired, log in again and retry once
+        if html_content is None and not self.logged_in:
+            self.login()
+            html_content = self.__fetch_schedule(date)
+        if not html_content:
+            return None
 
-        # Get first day of each week in range
-        dates = self.__get_dates_in_range()
+        return self.parse_week(html_content)
+
+    def iter_weeks(self, dates: Optional[List[str]] = None) -> Iterator[Tuple[str, List[Dict]]]:
+        """
+        Yield (week start date, parsed rows) pairs week by week, weeks that could not be fetched are skipped.
+        With periods set, rows of the fetched weeks that fall outside all periods are left out.
+        """
+        if dates is None:
+            dates = self.get_dates_in_range()
+        periods = self.schedule_config.periods
 
-        # Create a directory for temporary files if needed
+        for date in dates:
+            logging.info(f"Fetching schedule for week starting {date}")
+            rows = self.fetch_week(date)
+            if rows is None:
+                logging.error(f"Failed to fetch schedule for week starting {date}")
+                continue
+            yield date, within_periods(periods, rows) if periods else rows
+
+    def scrape_schedule(self):
+        """Main execution function"""
+        if not self.schedule_config.profile:
+            return self.__scrape_schedule()
+
+        # Sample the whole export, the profile is written even if the export fails
+        profiler = SamplingProfiler()
+        try:
+            with profiler:
+                return self.__scrape_schedule()
+        finally:
+            try:
+                profiler.save(self.schedule_config.output_dir, Path(self.schedule_config.output_filename).stem)
+            except Exception as e:
+                logging.warning(f"Failed to save profile: {e}")
+
+    def __scrape_schedule(self):
+        """Fetch, parse and export the configured weeks"""
+        # Get first day of each week in range, also validates the periods
+        dates = self.get_fetch_plan().weeks
+
+        # Weeks fetched by a previous, interrupted run with the same settings are kept in temp_schedules
         temp_dir = os.path.join(self.schedule_config.output_dir, "temp_schedules")
-        os.makedirs(temp_dir, exist_ok=True)
+        checkpoint = ScheduleCheckpoint(temp_dir, self.schedule_config)
+        checkpoint.load()
 
-        all_data = []
+        missing_dates = [date for date in dates if not checkpoint.is_done(date)]
+
+        failed_dates = []
 
         # Fetch schedule for each week
-        for date in dates:
+        for date in missing_dates:
             logging.info(f"Fetching schedule for week starting {date}")
-            html_content = self.__fetch_schedule(date)
-            if not html_content:
+            rows = self.fetch_week(date)
+            if rows is None:
                 logging.error(f"Failed to fetch schedule for week starting {date}")
+                failed_dates.append(date)
                 continue
 
-            # Parse the schedule
-            parser = ScheduleParser(html_content, self.schedule_config)
-            parser.parse_schedule()
+            checkpoint.mark_done(date, rows)
 
-            # Add the parsed data to the combined data
-            all_data.extend(parser.get_parsed_data())
+        # Combine the weeks in calendar order
+        all_data = []
+        for date in dates:
+            if checkpoint.is_done(date):
+                all_data.extend(checkpoint.get_rows(date))
 
         if not all_data:
             logging.error("No schedule data was fetched")
@@ -159,19 +327,20 @@ class ScheduleScraper:
 
         # Save the combined data
         try:
-            # Create a new parser with the combined data
-            combined_parser = ScheduleParser("", self.schedule_config)
-            combined_parser.set_parsed_data(all_data)
-            combined_parser.save_to_xlsx()
+            export_rows(self.schedule_config, all_data)
         except PermissionError as e:
             raise PermissionError({"title": e.args[0]["title"],
                                    "message": e.args[0]["message"]})
 
         logging.info(f"Schedule saved to {self.schedule_config.output_filename}")
 
+        # Keep the checkpoint so a rerun only fetches the weeks that failed
+        if failed_dates:
+            logging.warning(f"Keeping checkpoint, {len(failed_dates)} week(s) could not be fetched")
+            return
+
         # Clean up temporary files
         try:
-            import shutil
-            shutil.rmtree(temp_dir)
+            checkpoint.clear()
         except Exception as e:
-            logging.warning(f"Failed to clean up temporary files: {e}")
\ No newline at end of file
+            logging.warning(f"Failed to clean up temporary files: {e}")
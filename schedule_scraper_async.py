@@ -0,0 +1,102 @@
+import asyncio
+import logging
+from typing import AsyncIterator, List, Dict, Optional, Tuple
+
+import aiohttp
+
+from config import ScheduleConfig
+from schedule_planner import within_periods
+from schedule_scraper import ScheduleScraper, LoginError
+
+
+class AsyncScheduleScraper:
+    """
+    Asyncio counterpart of ScheduleScraper. Weeks are fetched concurrently and yielded as soon as they are parsed.
+    Login, URLs and parsing rules are shared with the sync scraper.
+    """
+
+    def __init__(self, schedule_config: ScheduleConfig, max_concurrency: int = 8):
+        self.schedule_config = schedule_config
+        self.max_concurrency = max_concurrency
+        # The sync scraper is only used for its URL, login and parsing logic, it never opens a connection here
+        self.scraper = ScheduleScraper(schedule_config)
+        self.config = self.scraper.config
+
+    async def __login(self, session: aiohttp.ClientSession) -> None:
+        """Perform login to the system, raises LoginError on failure"""
+        try:
+            async with session.post(self.config.login_url, data=self.scraper.get_login_payload()) as response:
+                response.raise_for_status()
+                response_text = await response.text()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logging.error(f"Login error: {e}")
+            raise LoginError({"title": "Błąd uwierzytelniania", "message": "Nie udało się połączyć z serwerem."})
+
+        if self.scraper.is_login_rejected(response_text):
+            logging.error("Invalid credentials")
+            raise LoginError({"title": "Błąd uwierzytelniania", "message": "Niepoprawny identyfikator lub hasło."})
+
+        logging.info("Login successful")
+
+    async def __fetch_week(self, session: aiohttp.ClientSession, semaphore: asyncio.Semaphore,
+                           date: str) -> Tuple[str, Optional[List[Dict]]]:
+        """Fetch and parse a single week, returns None as rows if the week could not be fetched"""
+        async with semaphore:
+            logging.info(f"Fetching schedule for week starting {date}")
+            try:
+                if self.scraper.uses_service():
+                    async with session.get(self.scraper.get_service_week_url(), params={'date': date},
+                                           headers=self.scraper.get_service_headers()) as response:
+                        response.raise_for_status()
+                        rows = await response.json()
+                    return date, self.scraper.apply_filters(rows)
+
+                async with session.get(self.scraper.get_schedule_url(date)) as response:
+                    response.raise_for_status()
+                    html_content = await response.text()
+                    if self.scraper.is_session_expired(str(response.url), html_content):
+                        logging.error(f"Session expired while fetching schedule for date {date}")
+                        return date, None
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                logging.error(f"Error fetching schedule for date {date}: {e}")
+                return date, None
+
+        # BeautifulSoup parsing is CPU bound, keep it off the event loop
+        rows = await asyncio.to_thread(self.scraper.parse_week, html_content)
+        return date, rows
+
+    async def iter_weeks(self, dates: Optional[List[str]] = None) -> AsyncIterator[Tuple[str, List[Dict]]]:
+        """
+        Yield (week start date, parsed rows) pairs in completion order.
+        Defaults to all weeks in the configured range. Weeks that could not be fetched are logged and skipped.
+        With periods set, rows outside all periods are left out.
+        """
+        if dates is None:
+            dates = self.scraper.get_dates_in_range()
+        periods = self.scraper.schedule_config.periods
+
+        timeout = aiohttp.ClientTimeout(total=self.config.request_timeout)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            if not self.scraper.uses_service():
+                await self.__login(session)
+
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+            tasks = [asyncio.create_task(self.__fetch_week(session, semaphore, date)) for date in dates]
+            try:
+                for next_done in asyncio.as_completed(tasks):
+                    date, rows = await next_done
+                    if rows is None:
+                        logging.error(f"Failed to fetch schedule for week starting {date}")
+                        continue
+                    yield date, within_periods(periods, rows) if periods else rows
+            finally:
+                # Consumer stopped early or failed, don't leave fetches running
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def iter_rows(self, dates: Optional[List[str]] = None) -> AsyncIterator[Dict]:
+        """Yield parsed rows one by one as their weeks arrive"""
+        async for _, rows in self.iter_weeks(dates):
+            for row in rows:
+                yield row
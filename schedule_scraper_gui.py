@@ -1,15 +1,31 @@
+import multiprocessing
 import os
 import sys
 import tkinter as tk
 from datetime import datetime
 from pathlib import Path
 from tkinter import filedialog, messagebox
+from typing import Optional
 
 import customtkinter as ctk
 import tkcalendar
 
-from config import ScheduleConfig
+from config import ScheduleConfig, SchedulePeriod
+from schedule_export import SHARD_BY_MONTH, SHARD_BY_EDITOR
+from schedule_prefetch import WeekPrefetcher
+from schedule_planner import PlanError, parse_date
+from schedule_preview import SchedulePreviewWindow
+from schedule_profiler import is_profiling_requested
 from schedule_scraper import ScheduleScraper
+from schedule_service import GRAFIKPLUS_SERVICE_URL, GRAFIKPLUS_SERVICE_TOKEN
+
+# Export split options shown in the GUI, mapped to ScheduleConfig.shard_by
+SHARD_OPTIONS = {
+    "Nie dziel": None,
+    "Miesiące": SHARD_BY_MONTH,
+    "Montażyści": SHARD_BY_EDITOR,
+}
+SHARD_OPTIONS_LABELS = list(SHARD_OPTIONS)
 
 # Set appearance mode in CustomTkinter (can be "System", "Dark" or "Light")
 ctk.set_appearance_mode("System")
@@ -23,6 +39,11 @@ class ScheduleScraperGUI:
         # Initialize the main window
         self.main_frame = None
         self.scraper = None
+        self.prefetcher = None
+        self._prefetch_job = None
+        self._prefetch_credentials = ('', '')
+        # Hidden diagnostics setting, also enabled by GRAFIKPLUS_PROFILE=1 or --profile
+        self.profiling = is_profiling_requested()
         self.root = ctk.CTk()
         self.root.title("GrafikPlus")
 
@@ -56,6 +77,13 @@ class ScheduleScraperGUI:
         # Load the last used username if available
         self._load_last_username()
 
+        # Restart background prefetching whenever the form changes
+        self._bind_prefetch_triggers()
+
+        # Hidden shortcut toggling the profiling of downloads
+        self.root.bind("<Control-Shift-KeyPress-P>", lambda _: self.toggle_profiling())
+        self._update_title()
+
     def set_window_icon(self):
         """Set window icon with proper resource path handling for both development and compiled modes."""
         try:
@@ -267,6 +295,25 @@ class ScheduleScraperGUI:
         self.filename_entry.pack(side="left", padx=(0, 5), pady=5, fill="x", expand=True)
         self.filename_entry.insert(0, "grafik")
 
+        # Checkbox for merging into an existing file
+        self.append_to_existing = tk.BooleanVar(value=False)
+        append_checkbox = ctk.CTkCheckBox(
+            output_frame,
+            text="Dopisz do istniejącego pliku (zastąp tylko pobrane tygodnie)",
+            variable=self.append_to_existing,
+            text_color=self.theme_colors["label_fg"]
+        )
+        append_checkbox.pack(pady=(0, 5), padx=15, anchor="w")
+
+        # Frame for splitting the export into several files
+        shard_frame = ctk.CTkFrame(output_frame, fg_color=self.theme_colors["section_bg"], corner_radius=8)
+        shard_frame.pack(pady=(0, 5), fill="x", padx=10)
+        shard_label = ctk.CTkLabel(shard_frame, text="Podziel na pliki:", text_color=self.theme_colors["label_fg"])
+        shard_label.pack(side="left", padx=(5, 10))
+        self.shard_by = tk.StringVar(value=SHARD_OPTIONS_LABELS[0])
+        shard_menu = ctk.CTkOptionMenu(shard_frame, variable=self.shard_by, values=SHARD_OPTIONS_LABELS, width=200)
+        shard_menu.pack(side="left", padx=(0, 5), pady=5)
+
     def create_calendar_frame(self, parent):
         """Creates the date selection section using calendar widgets."""
         cal_container = ctk.CTkFrame(parent, corner_radius=8, fg_color=self.theme_colors["section_bg"])
@@ -340,7 +387,28 @@ class ScheduleScraperGUI:
             font=ctk.CTkFont(size=12, slant="italic"),
             text_color=self.theme_colors["label_fg"]
         )
-        info_label.pack(pady=(5, 10))
+        info_label.pack(pady=(5, 5))
+
+        # Opt-in background prefetching of the selected weeks
+        self.prefetch_enabled = tk.BooleanVar(value=False)
+        prefetch_checkbox = ctk.CTkCheckBox(
+            cal_container,
+            text="Pobieraj wybrane tygodnie w tle",
+            variable=self.prefetch_enabled,
+            text_color=self.theme_colors["label_fg"]
+        )
+        prefetch_checkbox.pack(pady=(0, 5))
+
+        # List of several date ranges downloaded in one run
+        self.periods = []
+        periods_frame = ctk.CTkFrame(cal_container, fg_color=self.theme_colors["section_bg"])
+        periods_frame.pack(fill="x", padx=10, pady=(0, 10))
+        add_period_button = ctk.CTkButton(periods_frame, text="Dodaj zakres do listy", command=self.add_period, width=160)
+        add_period_button.pack(side="left", padx=5)
+        clear_periods_button = ctk.CTkButton(periods_frame, text="Wyczyść listę", command=self.clear_periods, width=120)
+        clear_periods_button.pack(side="left", padx=5)
+        self.periods_label = ctk.CTkLabel(periods_frame, text="Lista zakresów: pusta", text_color=self.theme_colors["label_fg"])
+        self.periods_label.pack(side="left", padx=10)
 
     def create_button_frame(self, parent):
         """Creates the section for action buttons."""
@@ -351,18 +419,28 @@ class ScheduleScraperGUI:
             btn_frame,
             text="Pobierz grafik",
             command=self.download_schedule,
-            width=200,
+            width=160,
             fg_color=self.theme_colors["button_download"],
             text_color="black",
             font=ctk.CTkFont(size=16, weight="bold")
         )
         download_button.pack(side="left", padx=10, pady=10, expand=True)
 
+        preview_button = ctk.CTkButton(
+            btn_frame,
+            text="Podgląd",
+            command=self.open_preview,
+            width=160,
+            text_color="black",
+            font=ctk.CTkFont(size=16, weight="bold")
+        )
+        preview_button.pack(side="left", padx=10, pady=10, expand=True)
+
         exit_button = ctk.CTkButton(
             btn_frame,
             text="Wyjście",
             command=self.on_closing,
-            width=200,
+            width=160,
             fg_color=self.theme_colors["button_exit"],
             text_color="black",
             font=ctk.CTkFont(size=16, weight="bold")
@@ -387,35 +465,157 @@ class ScheduleScraperGUI:
         if directory:
             self.output_dir.set(directory)
 
-    def download_schedule(self):
-        """Handles the request to download the schedule."""
-        username = self.username_entry.get()
-        password = self.password_entry.get().strip()
+    def toggle_profiling(self):
+        """Switches profiling of the next downloads on or off."""
+        self.profiling = not self.profiling
+        self._update_title()
 
-        # Validate login credentials
-        if not username or not password:
-            self.show_error_message("Błąd walidacji", "Nazwa użytkownika i hasło nie mogą być puste!")
+    def _update_title(self):
+        self.root.title("GrafikPlus [profilowanie]" if self.profiling else "GrafikPlus")
+
+    def add_period(self):
+        """Adds the range currently selected on the calendars to the list of periods."""
+        start_date = self.calendar_start_date.get_date()
+        end_date = self.calendar_end_date.get_date()
+        # Keep the calendar behaviour of accepting the dates in either order
+        if parse_date(end_date) < parse_date(start_date):
+            start_date, end_date = end_date, start_date
+
+        name = f"{start_date} - {end_date}"
+        if any(period.name == name for period in self.periods):
+            return
+        self.periods.append(SchedulePeriod(name=name, start_date=start_date, end_date=end_date))
+        self._update_periods_label()
+        self._schedule_prefetch_update()
+
+    def clear_periods(self):
+        """Clears the list of periods, the calendar range is used again."""
+        self.periods = []
+        self._update_periods_label()
+        self._schedule_prefetch_update()
+
+    def _update_periods_label(self):
+        if self.periods:
+            self.periods_label.configure(text=f"Lista zakresów: {len(self.periods)}")
+        else:
+            self.periods_label.configure(text="Lista zakresów: pusta")
+
+    def _bind_prefetch_triggers(self):
+        """Schedules a prefetch update on every change of schedule type or selected dates, and once credentials are entered."""
+        # Credentials are only picked up when the field is left or confirmed, a half-typed password
+        # must never be sent as a login attempt
+        for entry in (self.username_entry, self.password_entry):
+            entry.bind("<FocusOut>", lambda _: self._commit_prefetch_credentials(), add="+")
+            entry.bind("<Return>", lambda _: self._commit_prefetch_credentials(), add="+")
+        self.calendar_start_date.bind("<<CalendarSelected>>", lambda _: self._schedule_prefetch_update(), add="+")
+        self.calendar_end_date.bind("<<CalendarSelected>>", lambda _: self._schedule_prefetch_update(), add="+")
+        self.schedule_type.trace_add("write", lambda *_: self._schedule_prefetch_update())
+        self.prefetch_enabled.trace_add("write", lambda *_: self._schedule_prefetch_update())
+
+    def _commit_prefetch_credentials(self):
+        """Remembers the credentials used by the prefetcher once the user leaves or confirms the field."""
+        self._prefetch_credentials = (self.username_entry.get().strip(), self.password_entry.get().strip())
+        self._schedule_prefetch_update()
+
+    def _schedule_prefetch_update(self):
+        """Debounces prefetch updates, so quick changes of the form restart the prefetcher only once."""
+        if self._prefetch_job is not None:
+            self.root.after_cancel(self._prefetch_job)
+        self._prefetch_job = self.root.after(700, self._update_prefetch)
+
+    def _update_prefetch(self):
+        """Starts, restarts or stops the background prefetcher to match the form."""
+        self._prefetch_job = None
+        config = self._build_config()
+        # Always the last committed credentials, never what is being typed right now
+        config.username, config.password = self._prefetch_credentials
+
+        if not self.prefetch_enabled.get() or not config.username or not config.password:
+            self._stop_prefetch()
             return
 
-        # Save the last used username
-        try:
-            self.last_username_file.write_text(username)
-        except Exception:
-            pass
+        if self.prefetcher is None or not self.prefetcher.matches(config):
+            self._stop_prefetch()
+            self.prefetcher = WeekPrefetcher(config)
 
-        credentials = ScheduleConfig(
-            username=username,
-            password=password,
+        self.prefetcher.update_selection(config.start_date, config.end_date, config.periods)
+
+    def _stop_prefetch(self):
+        """Stops the background prefetcher if one is running."""
+        if self.prefetcher is not None:
+            self.prefetcher.shutdown()
+            self.prefetcher = None
+
+    def _build_config(self) -> ScheduleConfig:
+        """Builds the schedule configuration from the current state of the form."""
+        return ScheduleConfig(
+            username=self.username_entry.get(),
+            password=self.password_entry.get().strip(),
             output_dir=self.output_dir.get(),
             output_filename=self.filename_entry.get() if self.filename_entry.get().endswith(
                 ".xlsx") else self.filename_entry.get() + ".xlsx",
             start_date=self.calendar_start_date.get_date(),
             end_date=self.calendar_end_date.get_date(),
-            is_personal=self.schedule_type.get() == 0
+            is_personal=self.schedule_type.get() == 0,
+            append_to_existing=self.append_to_existing.get(),
+            shard_by=SHARD_OPTIONS[self.shard_by.get()],
+            periods=list(self.periods) or None,
+            profile=self.profiling,
+            # Optional shared schedule service, see schedule_service.py
+            service_url=os.environ.get(GRAFIKPLUS_SERVICE_URL),
+            service_token=os.environ.get(GRAFIKPLUS_SERVICE_TOKEN)
         )
 
-        # Initialize the scraper
-        self.scraper = ScheduleScraper(credentials)
+    def _get_validated_config(self) -> Optional[ScheduleConfig]:
+        """Builds the configuration and validates login credentials, returns None after showing an error."""
+        credentials = self._build_config()
+
+        # Validate login credentials
+        if not credentials.username or not credentials.password:
+            self.show_error_message("Błąd walidacji", "Nazwa użytkownika i hasło nie mogą być puste!")
+            return None
+
+        # Save the last used username
+        try:
+            self.last_username_file.write_text(credentials.username)
+        except Exception:
+            pass
+
+        return credentials
+
+    def _get_week_cache(self, credentials: ScheduleConfig):
+        """Returns the background prefetcher if its weeks can be reused for the given settings."""
+        if self.prefetcher is not None and self.prefetcher.matches(credentials):
+            return self.prefetcher
+        return None
+
+    def open_preview(self):
+        """Opens a window previewing the parsed rows as they are fetched."""
+        credentials = self._get_validated_config()
+        if credentials is None:
+            return
+
+        SchedulePreviewWindow(self.root, credentials, self.theme_colors, week_cache=self._get_week_cache(credentials))
+
+    def download_schedule(self):
+        """Handles the request to download the schedule."""
+        credentials = self._get_validated_config()
+        if credentials is None:
+            return
+
+        # Initialize the scraper, reusing weeks that were already fetched in the background
+        self.scraper = ScheduleScraper(credentials, week_cache=self._get_week_cache(credentials))
+
+        # Several periods are deduplicated into one fetch plan, confirm it before downloading
+        if credentials.periods:
+            try:
+                plan = self.scraper.get_fetch_plan()
+            except PlanError as e:
+                details = e.args[0]
+                self.show_error_message(details["title"], details["message"])
+                return
+            if not messagebox.askyesno("Plan pobierania", plan.describe() + "\n\nRozpocząć pobieranie?"):
+                return
 
         # Download the schedule
         try:
@@ -430,6 +630,7 @@ class ScheduleScraperGUI:
 
     def on_closing(self):
         """Handles application closing."""
+        self._stop_prefetch()
         self.root.destroy()
 
     def run(self):
@@ -467,5 +668,7 @@ class ScheduleScraperGUI:
 
 
 if __name__ == "__main__":
+    # Needed by the sharded export's worker processes in the frozen executable
+    multiprocessing.freeze_support()
     app = ScheduleScraperGUI()
     app.run()
@@ -0,0 +1,219 @@
+import argparse
+import getpass
+import hmac
+import ipaddress
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Dict, Optional, Tuple
+from urllib.parse import urlparse, parse_qs
+
+from config import ScheduleConfig
+from schedule_layout import ScheduleLayoutError
+from schedule_scraper import ScheduleScraper, LoginError, ScheduleFetchError
+
+# Environment variables pointing the application to the service and holding the shared token
+GRAFIKPLUS_SERVICE_URL = 'GRAFIKPLUS_SERVICE_URL'
+GRAFIKPLUS_SERVICE_TOKEN = 'GRAFIKPLUS_SERVICE_TOKEN'
+
+
+class SingleFlight:
+    """Make concurrent calls for the same key share a single execution"""
+
+    class _Call:
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error: Optional[BaseException] = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, 'SingleFlight._Call'] = {}
+
+    def do(self, key: str, fn):
+        """Run fn for the key, or wait for the call already in progress and return its result"""
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = self._Call()
+                self._calls[key] = call
+
+        if not is_leader:
+            call.done.wait()
+        else:
+            try:
+                call.result = fn()
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+
+class ScheduleService:
+    """Shared cache of parsed general schedule weeks, fetched upstream at most once per week at a time"""
+
+    def __init__(self, username: str, password: str, cache_ttl: int = 900, token: Optional[str] = None):
+        self.schedule_config = ScheduleConfig(
+            username=username,
+            password=password,
+            output_dir='',
+            output_filename='',
+            start_date='',
+            end_date='',
+            is_personal=False,
+        )
+        self.scraper = ScheduleScraper(self.schedule_config)
+        self.cache_ttl = cache_ttl
+        # Shared secret the clients have to send, the service serves data fetched with the operator's login
+        self.token = token
+        self._cache: Dict[str, Tuple[float, List[Dict]]] = {}
+        self._cache_lock = threading.Lock()
+        # The scraper holds a single requests.Session, upstream access is serialized across handler threads
+        self._upstream_lock = threading.Lock()
+        self._logged_in = False
+        self._flight = SingleFlight()
+
+    @staticmethod
+    def normalize_week(date: str) -> str:
+        """Return Monday of the week containing the date, in format DD.MM.YYYY"""
+        parsed = datetime.strptime(date, '%d.%m.%Y')
+        return (parsed - timedelta(days=parsed.weekday())).strftime('%d.%m.%Y')
+
+    def is_authorized(self, authorization: Optional[str]) -> bool:
+        """Check the Authorization header of a request against the shared token, if one is set"""
+        if not self.token:
+            return True
+        return hmac.compare_digest((authorization or '').encode('utf-8'), f"Bearer {self.token}".encode('utf-8'))
+
+    def __ensure_login(self, force: bool = False) -> None:
+        if self._logged_in and not force:
+            return
+        self.scraper.login()
+        self._logged_in = True
+
+    def __fetch_upstream(self, week: str) -> List[Dict]:
+        with self._upstream_lock:
+            self.__ensure_login()
+            logging.info(f"Fetching schedule for week starting {week} from upstream")
+            rows = self.scraper.fetch_week(week)
+
+            # The scraper already logs in again when it is sent to the login page,
+            # a failed fetch may still be down to a session the server dropped, retry once
+            if rows is None:
+                self.__ensure_login(force=True)
+                rows = self.scraper.fetch_week(week)
+        if rows is None:
+            raise ScheduleFetchError({"title": "Błąd pobierania grafiku",
+                                      "message": f"Nie udało się pobrać grafiku dla tygodnia {week}."})
+
+        with self._cache_lock:
+            self._cache[week] = (time.monotonic(), rows)
+        return rows
+
+    def get_week(self, date: str) -> List[Dict]:
+        """Return parsed rows of the week containing the date, from cache when fresh"""
+        week = self.normalize_week(date)
+
+        with self._cache_lock:
+            cached = self._cache.get(week)
+        if cached and time.monotonic() - cached[0] < self.cache_ttl:
+            return cached[1]
+
+        return self._flight.do(week, lambda: self.__fetch_upstream(week))
+
+
+class ScheduleRequestHandler(BaseHTTPRequestHandler):
+    """Serves GET /week?date=DD.MM.YYYY as a JSON list of parsed rows"""
+
+    service: ScheduleService = None
+
+    def __send_json(self, status: int, content) -> None:
+        body = json.dumps(content, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if not self.service.is_authorized(self.headers.get('Authorization')):
+            self.__send_json(401, {"title": "Brak dostępu", "message": "Niepoprawny token serwisu grafików."})
+            return
+
+        url = urlparse(self.path)
+        if url.path != '/week':
+            self.__send_json(404, {"title": "Nie znaleziono", "message": f"Nieznana ścieżka {url.path}"})
+            return
+
+        date = parse_qs(url.query).get('date', [''])[0]
+        try:
+            rows = self.service.get_week(date)
+        except ValueError:
+            self.__send_json(400, {"title": "Błędna data", "message": f"Niepoprawna data: {date}"})
+        except (LoginError, ScheduleFetchError, ScheduleLayoutError) as e:
+            self.__send_json(502, e.args[0])
+        else:
+            self.__send_json(200, rows)
+
+    def log_message(self, format, *args):
+        logging.info(f"{self.address_string()} - {format % args}")
+
+
+def is_loopback(host: str) -> bool:
+    """Check whether the host only accepts connections from this machine"""
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def run_service(service: ScheduleService, host: str = '127.0.0.1', port: int = 8765) -> None:
+    """Serve the schedule service until interrupted, outside of loopback only with a shared token"""
+    if not is_loopback(host) and not service.token:
+        raise ValueError(f"Refusing to listen on {host} without a token, set {GRAFIKPLUS_SERVICE_TOKEN} "
+                         f"or pass --token")
+    handler = type('BoundScheduleRequestHandler', (ScheduleRequestHandler,), {'service': service})
+    server = ThreadingHTTPServer((host, port), handler)
+    logging.info(f"Schedule service listening on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Shared GrafikPlus schedule service")
+    arg_parser.add_argument('--host', default='127.0.0.1',
+                            help="Addresses other than loopback require a token")
+    arg_parser.add_argument('--port', type=int, default=8765)
+    arg_parser.add_argument('--cache-ttl', type=int, default=900, help="Seconds a fetched week stays cached")
+    arg_parser.add_argument('--token', default=os.environ.get(GRAFIKPLUS_SERVICE_TOKEN),
+                            help=f"Shared token required from clients, defaults to {GRAFIKPLUS_SERVICE_TOKEN}")
+    args = arg_parser.parse_args()
+
+    if not is_loopback(args.host) and not args.token:
+        arg_parser.error(f"--host {args.host} is reachable from other machines, a --token is required")
+
+    username = os.environ.get('GRAFIKPLUS_USERNAME') or input("Nazwa użytkownika: ")
+    password = os.environ.get('GRAFIKPLUS_PASSWORD') or getpass.getpass("Hasło: ")
+
+    run_service(ScheduleService(username, password, args.cache_ttl, args.token), args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()